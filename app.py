@@ -1,11 +1,23 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify
 import google.generativeai as genai
 import requests
 import os
 import logging
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from flask_cors import CORS
 
+from batch import MalformedBatchResponse, build_batch_prompt, chunk_posts, estimate_tokens, normalize_posts, parse_batch_verdicts
+import metrics
+from cache import ResponseCache
+from feed import FeedFetcher
+from gemini_client import GeminiClient, ModelUnavailableError
+from prefilter import Prefilter
+from streaming import SSE_HEADERS, KeywordSplitter, is_stream_requested, sse_event
+from summary import SummaryStore, budget_chunks, prepare_post_texts
+
 load_dotenv()
 
 app = Flask(__name__)
@@ -26,7 +38,387 @@ if not api_key:
 
 genai.configure(api_key=api_key)
 
-model = genai.GenerativeModel(model_name="gemini-1.5-flash")
+MODEL_NAME = "gemini-1.5-flash"
+PROMPT_VERSION = "1"
+
+model = genai.GenerativeModel(model_name=MODEL_NAME)
+
+gemini = GeminiClient.from_env(model)
+
+response_cache = ResponseCache.from_env()
+
+# Map-phase notes get their own LRU so classification traffic can't evict
+# them (and they don't count as response cache hits or misses).
+summary_notes_cache = ResponseCache.from_env("SUMMARY_NOTES_CACHE_SIZE", 512)
+
+# Only the explicit flag bypasses the cache: browsers send Cache-Control:
+# no-cache on a hard reload, and that must not spend model quota.
+def is_cache_bypass(args):
+    return args.get("no_cache", "").lower() in ("1", "true", "yes")
+
+def cache_bypass_requested():
+    return is_cache_bypass(request.args)
+
+def cached_payload(endpoint, text, bypass=None):
+    key = response_cache.make_key(endpoint, text, MODEL_NAME, PROMPT_VERSION)
+    if bypass is None:
+        bypass = cache_bypass_requested()
+    if bypass:
+        return key, None
+    return key, response_cache.get(key)
+
+BATCH_MAX_POSTS = int(os.getenv("BATCH_MAX_POSTS", "1000"))
+BATCH_CHUNK_TOKENS = int(os.getenv("BATCH_CHUNK_TOKENS", "6000"))
+BATCH_CHUNK_POSTS = int(os.getenv("BATCH_CHUNK_POSTS", "50"))
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "8"))
+
+CLASSIFIERS = {
+    "question": {
+        "criteria": "Este texto faz sentido em relação ao objetivo pedido pelo usuário? Avalie se o conteúdo claramente corresponde ao tema especificado pelo usuário e atende ao propósito pretendido.",
+        "answer": "Responda apenas com '{\"is_relevant\": true}' se o conteúdo do post estiver alinhado ao objetivo do usuário, ou '{\"is_not_relevant\": false}' se o conteúdo não estiver alinhado",
+        "positive_hint": "o conteúdo do post estiver alinhado ao objetivo do usuário",
+    },
+    "is_opportunity": {
+        "criteria": "Este texto refere-se a um anúncio de vaga de emprego? Ele deve claramente se referir a uma oportunidade de trabalho em uma empresa, e não pode ser sobre cursos ou treinamentos.",
+        "answer": "Responda apenas com '{\"is_opportunity\": true}' se for um anúncio de emprego, ou '{\"is_not_opportunity\": false}' se não for",
+        "positive_hint": "for um anúncio de emprego",
+    },
+}
+
+class ModelResponseError(Exception):
+    pass
+
+def unavailable_payload(e, cache_key=None):
+    cached = response_cache.get(cache_key) if cache_key else None
+    if cached is not None:
+        logging.warning(f"Modelo indisponível, servindo resposta do cache: {e}")
+        return cached, 200, {}
+    logging.error(f"Modelo indisponível: {e}")
+    return {"error": str(e)}, 503, {"Retry-After": str(math.ceil(e.retry_after))}
+
+def generated_text(response):
+    if response and response.candidates:
+        return response.candidates[0].content.parts[0].text
+    raise ModelResponseError("Nenhum conteúdo gerado.")
+
+def stream_generated_text(response):
+    generated = False
+    for chunk in response:
+        if chunk.candidates and chunk.candidates[0].content.parts:
+            generated = True
+            yield chunk.candidates[0].content.parts[0].text
+    if not generated:
+        raise ModelResponseError("Nenhum conteúdo gerado.")
+
+def stream_requested():
+    return is_stream_requested(request.args, request.headers)
+
+def event_stream(events):
+    return Response(events, mimetype="text/event-stream", headers=SSE_HEADERS)
+
+def parse_verdict(response_text):
+    response_text = response_text.strip().lower()
+    if "true" in response_text:
+        return True
+    if "false" in response_text:
+        return False
+    raise ModelResponseError("Resposta inesperada do modelo.")
+
+PREFILTER_ENABLED = os.getenv("PREFILTER_ENABLED", "0").lower() in ("1", "true", "yes")
+PREFILTER_ENDPOINTS = ("is_opportunity",)
+
+prefilter = Prefilter.from_env()
+
+def local_verdict(endpoint, post_text):
+    if not PREFILTER_ENABLED or endpoint not in PREFILTER_ENDPOINTS:
+        return None
+    return prefilter.decide(post_text)
+
+def remember_verdict(endpoint, cache_key, post_text, verdict):
+    response_cache.set(cache_key, {endpoint: verdict})
+    if endpoint in PREFILTER_ENDPOINTS:
+        prefilter.record(post_text, verdict)
+
+def classification_prompt(endpoint, post_text):
+    classifier = CLASSIFIERS[endpoint]
+    return f"{classifier['criteria']} {classifier['answer']}:\n\n\"{post_text}\""
+
+def classify_post(endpoint, post_text):
+    with metrics.stage("prompt"):
+        prompt = classification_prompt(endpoint, post_text)
+    verification_response = gemini.generate([prompt])
+    with metrics.stage("parse"):
+        return parse_verdict(generated_text(verification_response))
+
+def keywords_prompt(user_input):
+    return f"Quais são as principais palavras-chave e tópicos específicos que capturam o contexto do texto a seguir? Responda com uma lista de 190 palavras ou termos diretamente relacionados ao universo abordado, evitando termos genéricos como 'programação' ou 'tecnologia'. Em vez disso, foque em palavras e tópicos específicos que reflitam o conteúdo de forma precisa. Por exemplo, para um texto sobre Java, liste palavras como JPA, Spring Boot, Tomcat, arquitetura REST, entre outras que representem bem o assunto.\n\n\"{user_input}\""
+
+def parse_keywords(response_text):
+    return [keyword.strip() for keyword in response_text.strip().split(',') if keyword.strip()]
+
+def keyword_events(user_input, cache_key, cached):
+    try:
+        if cached is not None:
+            keywords = cached["keywords"]
+            for keyword in keywords:
+                yield sse_event("keyword", {"keyword": keyword})
+        else:
+            keywords = []
+            splitter = KeywordSplitter()
+            keywords_response = gemini.generate([keywords_prompt(user_input)], stream=True)
+            for piece in stream_generated_text(keywords_response):
+                for keyword in splitter.feed(piece):
+                    keywords.append(keyword)
+                    yield sse_event("keyword", {"keyword": keyword})
+            for keyword in splitter.close():
+                keywords.append(keyword)
+                yield sse_event("keyword", {"keyword": keyword})
+            response_cache.set(cache_key, {"keywords": keywords})
+
+        yield sse_event("done", {"count": len(keywords)})
+
+    except Exception as e:
+        logging.error(f"Erro inesperado: {e}")
+        yield sse_event("error", {"error": str(e)})
+
+def lookup_batch(endpoint, posts, bypass):
+    verdicts = {}
+    keys = {}
+    pending = []
+
+    for index, (post_id, text) in enumerate(posts):
+        keys[index], cached = cached_payload(endpoint, text, bypass)
+        if cached is not None:
+            verdicts[index] = cached[endpoint]
+            continue
+
+        verdict = local_verdict(endpoint, text)
+        if verdict is not None:
+            verdicts[index] = verdict
+        else:
+            pending.append((index, text))
+
+    return verdicts, keys, pending
+
+def chunk_prompt(endpoint, chunk):
+    classifier = CLASSIFIERS[endpoint]
+    texts = [text for _, text in chunk]
+    return build_batch_prompt(classifier["criteria"], classifier["positive_hint"], texts)
+
+def parse_chunk(chunk, batch_response):
+    verdicts = parse_batch_verdicts(generated_text(batch_response), len(chunk))
+    return [(index, verdict) for (index, _), verdict in zip(chunk, verdicts)]
+
+def unavailable_results(chunk, e):
+    logging.error(f"Modelo indisponível para {len(chunk)} posts do lote: {e}")
+    return [(index, e) for index, _ in chunk]
+
+def store_verdicts(endpoint, posts, keys, chunk_results, verdicts):
+    for index, verdict in chunk_results:
+        verdicts[index] = verdict
+        if isinstance(verdict, bool):
+            remember_verdict(endpoint, keys[index], posts[index][1], verdict)
+
+def batch_payload(endpoint, posts, verdicts):
+    # Posts the model couldn't answer get a per-post error; verdicts already
+    # resolved from the cache, the prefilter or earlier chunks are kept.
+    results = []
+    unavailable = None
+    for index, (post_id, text) in enumerate(posts):
+        verdict = verdicts[index]
+        if isinstance(verdict, ModelUnavailableError):
+            unavailable = verdict
+            results.append({"id": post_id, "error": str(verdict)})
+        elif verdict is None:
+            results.append({"id": post_id, "error": "Resposta inesperada do modelo."})
+        else:
+            results.append({"id": post_id, endpoint: verdict})
+
+    if unavailable is None:
+        return {"results": results}, 200, {}
+    answered = any(isinstance(verdict, bool) for verdict in verdicts.values())
+    return {"results": results}, 200 if answered else 503, {"Retry-After": str(math.ceil(unavailable.retry_after))}
+
+FEED_URL = os.getenv("FEED_URL", "https://milharal-news.onrender.com/post")
+
+feed_fetcher = FeedFetcher.from_env(FEED_URL)
+
+def format_post_texts(data):
+    post_texts = []
+
+    for post in data:
+        author = post.get('author', {})
+        display_name = author.get('displayName', 'Desconhecido')
+        handle = author.get('handle', 'Sem handle')
+        text = post.get('record', {}).get('text', 'Sem texto')
+
+        post_texts.append(f"{display_name} ({handle}): {text}")
+
+    return post_texts
+
+def load_post_texts():
+    return format_post_texts(feed_fetcher.get_posts())
+
+SUMMARY_DIRECT_TOKENS = int(os.getenv("SUMMARY_DIRECT_TOKENS", "30000"))
+SUMMARY_CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", "8000"))
+SUMMARY_CHUNK_POSTS = int(os.getenv("SUMMARY_CHUNK_POSTS", "32"))
+SUMMARY_MAP_WORKERS = int(os.getenv("SUMMARY_MAP_WORKERS", "4"))
+SUMMARY_REDUCE_LEVELS = int(os.getenv("SUMMARY_REDUCE_LEVELS", "3"))
+
+SUMMARY_ARTICLE = "Crie uma matéria com 5 seções, cada uma cobrindo uma treta no estilo cancelamento do Twitter. O tom deve ser direto e analítico, destacando: O que iniciou a briga, os argumentos de cada lado, indiretas, exposed e repercussão, consequências para os envolvidos. O objetivo é relatar os conflitos entre devs influentes, é briga séria, acusações essas coisas, briga mesmo com temas reais e não tecnológicos"
+
+def summary_prompt(post_texts_str):
+    return f"Receba os dados dos feeds de hoje do Bluesky, focados exclusivamente em tretas entre influencers. {SUMMARY_ARTICLE}:\n\n{post_texts_str}"
+
+def summary_map_prompt(chunk_text):
+    return f"Extraia dos posts do Bluesky abaixo apenas as tretas entre influencers: quem está envolvido, o que iniciou a briga, os argumentos de cada lado, indiretas, exposed e repercussão. Responda com anotações curtas em tópicos, citando os handles, e ignore posts sem conflito:\n\n{chunk_text}"
+
+def summary_combine_prompt(notes):
+    return f"Extraia das anotações abaixo, vindas de partes diferentes do feed do Bluesky, as tretas entre influencers, juntando as que tratam da mesma briga. Responda com anotações curtas em tópicos, citando os handles:\n\n{notes}"
+
+def summary_reduce_prompt(notes):
+    return f"Receba as anotações extraídas dos feeds de hoje do Bluesky, focadas exclusivamente em tretas entre influencers. {SUMMARY_ARTICLE}:\n\n{notes}"
+
+def summarize_chunk(chunk, endpoint="summary_chunk", build_prompt=summary_map_prompt):
+    chunk_text = "\n".join(chunk)
+    cache_key = summary_notes_cache.make_key(endpoint, chunk_text, MODEL_NAME, PROMPT_VERSION)
+    cached = summary_notes_cache.get(cache_key)
+    if cached is not None:
+        return cached["notes"]
+
+    notes = generated_text(gemini.generate([build_prompt(chunk_text)]))
+    summary_notes_cache.set(cache_key, {"notes": notes})
+    return notes
+
+def summarize_chunks(chunks, endpoint, build_prompt):
+    route = metrics.current_route.get()
+
+    def summarize_chunk_for_route(chunk):
+        metrics.current_route.set(route)
+        return summarize_chunk(chunk, endpoint, build_prompt)
+
+    with ThreadPoolExecutor(max_workers=SUMMARY_MAP_WORKERS) as pool:
+        return list(pool.map(summarize_chunk_for_route, chunks))
+
+def final_summary_prompt(post_texts):
+    post_texts = prepare_post_texts(post_texts)
+
+    if sum(estimate_tokens(text) for text in post_texts) <= SUMMARY_DIRECT_TOKENS:
+        return summary_prompt(" ".join(post_texts))
+
+    with metrics.stage("summary_map"):
+        chunks = budget_chunks(post_texts, SUMMARY_CHUNK_TOKENS, SUMMARY_CHUNK_POSTS)
+        notes = summarize_chunks(chunks, "summary_chunk", summary_map_prompt)
+        logging.info(f"Resumo em map-reduce: {len(post_texts)} posts em {len(notes)} blocos.")
+
+        # The notes get the same budget as a direct prompt; while they exceed
+        # it, groups of notes (cut by tokens alone, so every level shrinks)
+        # are condensed into one note each.
+        for level in range(SUMMARY_REDUCE_LEVELS):
+            if len(notes) <= 1 or sum(estimate_tokens(note) for note in notes) <= SUMMARY_DIRECT_TOKENS:
+                break
+            chunks = budget_chunks(notes, SUMMARY_CHUNK_TOKENS)
+            notes = summarize_chunks(chunks, "summary_notes", summary_combine_prompt)
+            logging.info(f"Anotações condensadas (nível {level + 1}) em {len(notes)} blocos.")
+
+    if sum(estimate_tokens(note) for note in notes) > SUMMARY_DIRECT_TOKENS:
+        logging.warning("Anotações ainda acima do orçamento do resumo após a redução hierárquica.")
+    return summary_reduce_prompt("\n\n".join(notes))
+
+def build_summary(post_texts):
+    summary_response = gemini.generate([final_summary_prompt(post_texts)])
+    return generated_text(summary_response)
+
+def stream_summary(post_texts):
+    summary_response = gemini.generate([final_summary_prompt(post_texts)], stream=True)
+    return stream_generated_text(summary_response)
+
+summary_cache = ResponseCache.from_env("SUMMARY_CACHE_SIZE", 8)
+
+summary_store = SummaryStore.from_env(
+    load_post_texts,
+    build_summary,
+    stream_summary,
+    cache=summary_cache,
+    cache_key=lambda current_hash: summary_cache.make_key("summary", current_hash, MODEL_NAME, PROMPT_VERSION),
+)
+
+def summary_events(force_refresh):
+    try:
+        for event, data in summary_store.stream(force_refresh):
+            yield sse_event(event, data)
+
+    except requests.exceptions.RequestException as req_err:
+        logging.error(f"Erro ao fazer a requisição: {req_err}")
+        yield sse_event("error", {"error": "Erro ao fazer a requisição para obter os posts."})
+
+    except Exception as e:
+        logging.error(f"Erro inesperado: {e}")
+        yield sse_event("error", {"error": str(e)})
+
+def collect_component_metrics():
+    cache = response_cache.stats()
+    notes_cache = summary_notes_cache.stats()
+    feed = feed_fetcher.stats()
+    summary = summary_store.stats()
+    client = gemini.stats()
+    local = prefilter.stats()
+    return [
+        ("response_cache_lookups_total", "counter", "Consultas ao cache de respostas.", {
+            (("result", "hit"),): cache["hits"],
+            (("result", "miss"),): cache["misses"],
+        }),
+        ("response_cache_disk_hits_total", "counter", "Acertos servidos pelo cache em disco.", {(): cache["disk_hits"]}),
+        ("response_cache_evictions_total", "counter", "Entradas removidas do cache em memória por LRU.", {(): cache["evictions"]}),
+        ("response_cache_entries", "gauge", "Entradas no cache em memória.", {(): cache["size"]}),
+        ("feed_requests_total", "counter", "Leituras do feed por resultado.", {
+            (("result", "download"),): feed["downloads"],
+            (("result", "not_modified"),): feed["not_modified"],
+            (("result", "cache_hit"),): feed["cache_hits"],
+            (("result", "shared"),): feed["shared_fetches"],
+        }),
+        ("summary_notes_cache_lookups_total", "counter", "Consultas ao cache de anotações do map-reduce.", {
+            (("result", "hit"),): notes_cache["hits"],
+            (("result", "miss"),): notes_cache["misses"],
+        }),
+        ("summary_notes_cache_evictions_total", "counter", "Anotações removidas do cache em memória por LRU.", {(): notes_cache["evictions"]}),
+        ("summary_builds_total", "counter", "Resumos gerados pelo modelo.", {(): summary["builds"]}),
+        ("summary_shared_hits_total", "counter", "Resumos reaproveitados do cache compartilhado entre workers.", {(): summary["shared_hits"]}),
+        ("summary_refresh_errors_total", "counter", "Falhas na atualização do resumo em segundo plano.", {(): summary["refresh_errors"]}),
+        ("summary_age_seconds", "gauge", "Idade do resumo armazenado.", {(): summary["age_seconds"] or 0}),
+        ("gemini_calls_total", "counter", "Chamadas enviadas ao modelo.", {(): client["calls"]}),
+        ("gemini_coalesced_total", "counter", "Chamadas idênticas atendidas por uma chamada em andamento.", {(): client["coalesced"]}),
+        ("gemini_retries_total", "counter", "Novas tentativas após erros temporários.", {(): client["retries"]}),
+        ("gemini_short_circuited_total", "counter", "Chamadas recusadas com o circuito aberto.", {(): client["short_circuited"]}),
+        ("gemini_throttled_seconds_total", "counter", "Tempo total de espera no limitador de taxa.", {(): client["throttled_seconds"]}),
+        ("gemini_rate_per_minute", "gauge", "Taxa atual do limitador adaptativo.", {(): client["rate_per_minute"]}),
+        ("gemini_circuit_open", "gauge", "1 quando o circuito do modelo está aberto.", {(): int(client["circuit"] != "closed")}),
+        ("prefilter_decisions_total", "counter", "Decisões do pré-filtro local.", {
+            (("decision", "negative"),): local["local_negative"],
+            (("decision", "positive"),): local["local_positive"],
+            (("decision", "model"),): local["sent_to_model"],
+        }),
+    ]
+
+metrics.registry.register_collector(collect_component_metrics)
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    metrics.registry.start_flusher()
+    metrics.current_route.set(request.url_rule.rule if request.url_rule else "unmatched")
+
+@app.after_request
+def observe_request(response):
+    started = g.get("request_started")
+    if started is not None:
+        metrics.request_duration.observe(
+            time.perf_counter() - started,
+            route=request.url_rule.rule if request.url_rule else "unmatched",
+            method=request.method,
+            status=response.status_code,
+        )
+    return response
 
 @app.route('/keywords', methods=['GET'])
 def generate_keywords():
@@ -36,24 +428,50 @@ def generate_keywords():
         if not user_input:
             return jsonify({"error": "Texto não fornecido."}), 400
 
-        prompt = (
-    f"Quais são as principais palavras-chave e tópicos específicos que capturam o contexto do texto a seguir? Responda com uma lista de 190 palavras ou termos diretamente relacionados ao universo abordado, evitando termos genéricos como 'programação' ou 'tecnologia'. Em vez disso, foque em palavras e tópicos específicos que reflitam o conteúdo de forma precisa. Por exemplo, para um texto sobre Java, liste palavras como JPA, Spring Boot, Tomcat, arquitetura REST, entre outras que representem bem o assunto.\n\n\"{user_input}\""
-            )        
-        keywords_response = model.generate_content([prompt])
+        cache_key, cached = cached_payload("keywords", user_input)
+        if stream_requested():
+            return event_stream(keyword_events(user_input, cache_key, cached))
+        if cached is not None:
+            return jsonify(cached)
+
+        with metrics.stage("prompt"):
+            prompt = keywords_prompt(user_input)
+        keywords_response = gemini.generate([prompt])
 
         if keywords_response and keywords_response.candidates:
-            response_text = keywords_response.candidates[0].content.parts[0].text.strip()
-            keywords = [keyword.strip() for keyword in response_text.split(',') if keyword.strip()]
-            return jsonify({"keywords": keywords})
+            with metrics.stage("parse"):
+                keywords = parse_keywords(keywords_response.candidates[0].content.parts[0].text)
+            payload = {"keywords": keywords}
+            response_cache.set(cache_key, payload)
+            return jsonify(payload)
         else:
             return jsonify({"error": "Nenhum conteúdo gerado."}), 500
 
+    except ModelUnavailableError as e:
+        payload, status, headers = unavailable_payload(e, cache_key)
+        return jsonify(payload), status, headers
+
     except Exception as e:
         logging.error(f"Erro inesperado: {e}")
         return jsonify({"error": str(e)}), 500
 
 @app.route('/question', methods=['GET'])
 def question():
+    return classify_route("question")
+
+@app.route('/is_opportunity', methods=['GET'])
+def is_opportunity():
+    return classify_route("is_opportunity")
+
+@app.route('/question/batch', methods=['POST'])
+def question_batch():
+    return classify_batch_route("question")
+
+@app.route('/is_opportunity/batch', methods=['POST'])
+def is_opportunity_batch():
+    return classify_batch_route("is_opportunity")
+
+def classify_route(endpoint):
     try:
     
         post_text = request.args.get("text")
@@ -61,91 +479,124 @@ def question():
         if not post_text:
             return jsonify({"error": "Texto do post não fornecido."}), 400
 
-        prompt = f"Este texto faz sentido em relação ao objetivo pedido pelo usuário? Avalie se o conteúdo claramente corresponde ao tema especificado pelo usuário e atende ao propósito pretendido. Responda apenas com '{{\"is_relevant\": true}}' se o conteúdo do post estiver alinhado ao objetivo do usuário, ou '{{\"is_not_relevant\": false}}' se o conteúdo não estiver alinhado:\n\n\"{post_text}\""
-        verification_response = model.generate_content([prompt])
+        cache_key, cached = cached_payload(endpoint, post_text)
+        if cached is not None:
+            return jsonify(cached)
 
-        if verification_response and verification_response.candidates:
-            response_text = verification_response.candidates[0].content.parts[0].text.strip().lower()
+        verdict = local_verdict(endpoint, post_text)
+        if verdict is not None:
+            return jsonify({endpoint: verdict})
 
-            if "true" in response_text:
-                return jsonify({"question": True})
-            elif "false" in response_text:
-                return jsonify({"question": False})
-            else:
-                return jsonify({"error": "Resposta inesperada do modelo."}), 500
-        else:
-            return jsonify({"error": "Nenhum conteúdo gerado."}), 500
+        try:
+            verdict = classify_post(endpoint, post_text)
+        except ModelResponseError as e:
+            return jsonify({"error": str(e)}), 500
+
+        remember_verdict(endpoint, cache_key, post_text, verdict)
+        return jsonify({endpoint: verdict})
+
+    except ModelUnavailableError as e:
+        payload, status, headers = unavailable_payload(e, cache_key)
+        return jsonify(payload), status, headers
 
     except Exception as e:
         logging.error(f"Erro inesperado: {e}")
         return jsonify({"error": str(e)}), 500
 
-@app.route('/is_opportunity', methods=['GET'])
-def is_opportunity():
+def classify_batch_route(endpoint):
     try:
-    
-        post_text = request.args.get("text")
+        try:
+            posts = normalize_posts(request.get_json(silent=True))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
 
-        if not post_text:
-            return jsonify({"error": "Texto do post não fornecido."}), 400
+        if len(posts) > BATCH_MAX_POSTS:
+            return jsonify({"error": f"Envie no máximo {BATCH_MAX_POSTS} posts por requisição."}), 400
 
-        prompt = f"Este texto refere-se a um anúncio de vaga de emprego? Ele deve claramente se referir a uma oportunidade de trabalho em uma empresa, e não pode ser sobre cursos ou treinamentos. Responda apenas com '{{\"is_opportunity\": true}}' se for um anúncio de emprego, ou '{{\"is_not_opportunity\": false}}' se não for:\n\n\"{post_text}\""
-        verification_response = model.generate_content([prompt])
+        verdicts, keys, pending = lookup_batch(endpoint, posts, cache_bypass_requested())
 
-        if verification_response and verification_response.candidates:
-            response_text = verification_response.candidates[0].content.parts[0].text.strip().lower()
+        route = metrics.current_route.get()
 
-            if "true" in response_text:
-                return jsonify({"is_opportunity": True})
-            elif "false" in response_text:
-                return jsonify({"is_opportunity": False})
-            else:
-                return jsonify({"error": "Resposta inesperada do modelo."}), 500
-        else:
-            return jsonify({"error": "Nenhum conteúdo gerado."}), 500
+        def classify_or_unavailable(chunk):
+            metrics.current_route.set(route)
+            try:
+                return classify_chunk(endpoint, chunk)
+            except ModelUnavailableError as e:
+                return unavailable_results(chunk, e)
+
+        # Chunks run in parallel so a full batch fits in a sync worker's timeout.
+        chunks = chunk_posts(pending, BATCH_CHUNK_TOKENS, BATCH_CHUNK_POSTS)
+        with ThreadPoolExecutor(max_workers=BATCH_WORKERS) as pool:
+            for chunk_results in pool.map(classify_or_unavailable, chunks):
+                store_verdicts(endpoint, posts, keys, chunk_results, verdicts)
+
+        payload, status, headers = batch_payload(endpoint, posts, verdicts)
+        return jsonify(payload), status, headers
 
     except Exception as e:
         logging.error(f"Erro inesperado: {e}")
         return jsonify({"error": str(e)}), 500
 
+def classify_chunk(endpoint, chunk):
+    with metrics.stage("prompt"):
+        prompt = chunk_prompt(endpoint, chunk)
+    batch_response = gemini.generate([prompt], generation_config={"response_mime_type": "application/json"})
+
+    try:
+        with metrics.stage("parse"):
+            return parse_chunk(chunk, batch_response)
+    except (ModelResponseError, MalformedBatchResponse) as e:
+        logging.warning(f"Lote malformado ({len(chunk)} posts), reclassificando um a um: {e}")
+
+    results = []
+    for index, text in chunk:
+        try:
+            results.append((index, classify_post(endpoint, text)))
+        except ModelResponseError as e:
+            logging.error(f"Falha ao classificar post {index}: {e}")
+            results.append((index, None))
+        except ModelUnavailableError as e:
+            results.append((index, e))
+    return results
+
 @app.route('/summarize_posts', methods=['GET'])
 def summarize_posts():
-    url = "https://milharal-news.onrender.com/post"
-    
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-
-        data = response.json()
-        post_texts = []
-
-        for post in data:
-            author = post.get('author', {})
-            display_name = author.get('displayName', 'Desconhecido')
-            handle = author.get('handle', 'Sem handle')
-            text = post.get('record', {}).get('text', 'Sem texto')
-
-            post_texts.append(f"{display_name} ({handle}): {text}")
-
-        post_texts_str = " ".join(post_texts)
-
-        prompt = f"Receba os dados dos feeds de hoje do Bluesky, focados exclusivamente em tretas entre influencers. Crie uma matéria com 5 seções, cada uma cobrindo uma treta no estilo cancelamento do Twitter. O tom deve ser direto e analítico, destacando: O que iniciou a briga, os argumentos de cada lado, indiretas, exposed e repercussão, consequências para os envolvidos. O objetivo é relatar os conflitos entre devs influentes, é briga séria, acusações essas coisas, briga mesmo com temas reais e não tecnológicos:\n\n{post_texts_str}"
-
-        summary_response = model.generate_content([prompt])
-
-        if summary_response and summary_response.candidates:
-            text = summary_response.candidates[0].content.parts[0].text
-            return jsonify({"summary": text})
-        else:
-            return jsonify({"error": "Nenhum conteúdo gerado."}), 500
+        # An explicit refresh re-checks the feed; an unchanged feed is not rebuilt.
+        force_refresh = cache_bypass_requested()
+        if stream_requested():
+            return event_stream(summary_events(force_refresh))
+        return jsonify(summary_store.get(force_refresh=force_refresh))
 
     except requests.exceptions.RequestException as req_err:
         logging.error(f"Erro ao fazer a requisição: {req_err}")
         return jsonify({"error": "Erro ao fazer a requisição para obter os posts."}), 500
 
+    except ModelResponseError as e:
+        return jsonify({"error": str(e)}), 500
+
+    except ModelUnavailableError as e:
+        payload, status, headers = unavailable_payload(e)
+        return jsonify(payload), status, headers
+
     except Exception as e:
         logging.error(f"Erro inesperado: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/stats', methods=['GET'])
+def stats():
+    return jsonify({
+        "cache": response_cache.stats(),
+        "summary_notes_cache": summary_notes_cache.stats(),
+        "feed": feed_fetcher.stats(),
+        "summary": summary_store.stats(),
+        "gemini": gemini.stats(),
+        "prefilter": prefilter.stats(),
+    })
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    return Response(metrics.registry.render(), content_type=metrics.CONTENT_TYPE)
+
 if __name__ == '__main__':
     app.run(debug=True)
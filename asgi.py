@@ -0,0 +1,322 @@
+import asyncio
+import contextlib
+import logging
+import os
+import time
+
+import httpx
+import requests
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+import app as service
+import metrics
+from batch import MalformedBatchResponse, chunk_posts, normalize_posts
+from gemini_client import ModelUnavailableError
+from streaming import SSE_HEADERS, KeywordSplitter, is_stream_requested, sse_event
+
+ASYNC_MAX_CONCURRENCY = int(os.getenv("ASYNC_MAX_CONCURRENCY", "256"))
+
+model_semaphore = asyncio.Semaphore(ASYNC_MAX_CONCURRENCY)
+in_flight = 0
+
+async def generate(contents, **kwargs):
+    global in_flight
+    async with model_semaphore:
+        in_flight += 1
+        try:
+            return await service.gemini.generate_async(contents, **kwargs)
+        finally:
+            in_flight -= 1
+
+async def stream_generate(contents, **kwargs):
+    global in_flight
+    async with model_semaphore:
+        in_flight += 1
+        try:
+            response = await service.gemini.generate_async(contents, stream=True, **kwargs)
+            generated = False
+            async for chunk in response:
+                if chunk.candidates and chunk.candidates[0].content.parts:
+                    generated = True
+                    yield chunk.candidates[0].content.parts[0].text
+            if not generated:
+                raise service.ModelResponseError("Nenhum conteúdo gerado.")
+        finally:
+            in_flight -= 1
+
+# The response cache may read and write its SQLite tier, and remembering a
+# verdict appends to the prefilter log, so those calls run on a thread
+# instead of blocking every request on the event loop.
+async def unavailable_response(e, cache_key=None):
+    payload, status, headers = await asyncio.to_thread(service.unavailable_payload, e, cache_key)
+    return JSONResponse(payload, status_code=status, headers=headers)
+
+def event_stream(events):
+    return StreamingResponse(events, media_type="text/event-stream", headers=SSE_HEADERS)
+
+async def keyword_events(user_input, cache_key, cached):
+    try:
+        if cached is not None:
+            keywords = cached["keywords"]
+            for keyword in keywords:
+                yield sse_event("keyword", {"keyword": keyword})
+        else:
+            keywords = []
+            splitter = KeywordSplitter()
+            async for piece in stream_generate([service.keywords_prompt(user_input)]):
+                for keyword in splitter.feed(piece):
+                    keywords.append(keyword)
+                    yield sse_event("keyword", {"keyword": keyword})
+            for keyword in splitter.close():
+                keywords.append(keyword)
+                yield sse_event("keyword", {"keyword": keyword})
+            await asyncio.to_thread(service.response_cache.set, cache_key, {"keywords": keywords})
+
+        yield sse_event("done", {"count": len(keywords)})
+
+    except Exception as e:
+        logging.error(f"Erro inesperado: {e}")
+        yield sse_event("error", {"error": str(e)})
+
+async def keywords(request):
+    try:
+        user_input = request.query_params.get("text")
+
+        if not user_input:
+            return JSONResponse({"error": "Texto não fornecido."}, status_code=400)
+
+        bypass = service.is_cache_bypass(request.query_params)
+        cache_key, cached = await asyncio.to_thread(service.cached_payload, "keywords", user_input, bypass)
+        if is_stream_requested(request.query_params, request.headers):
+            return event_stream(keyword_events(user_input, cache_key, cached))
+        if cached is not None:
+            return JSONResponse(cached)
+
+        with metrics.stage("prompt"):
+            prompt = service.keywords_prompt(user_input)
+        keywords_response = await generate([prompt])
+        with metrics.stage("parse"):
+            payload = {"keywords": service.parse_keywords(service.generated_text(keywords_response))}
+        await asyncio.to_thread(service.response_cache.set, cache_key, payload)
+        return JSONResponse(payload)
+
+    except service.ModelResponseError as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+    except ModelUnavailableError as e:
+        return await unavailable_response(e, cache_key)
+
+    except Exception as e:
+        logging.error(f"Erro inesperado: {e}")
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+async def classify_post(endpoint, post_text):
+    with metrics.stage("prompt"):
+        prompt = service.classification_prompt(endpoint, post_text)
+    verification_response = await generate([prompt])
+    with metrics.stage("parse"):
+        return service.parse_verdict(service.generated_text(verification_response))
+
+def classify_route(endpoint):
+    async def route(request):
+        try:
+            post_text = request.query_params.get("text")
+
+            if not post_text:
+                return JSONResponse({"error": "Texto do post não fornecido."}, status_code=400)
+
+            bypass = service.is_cache_bypass(request.query_params)
+            cache_key, cached = await asyncio.to_thread(service.cached_payload, endpoint, post_text, bypass)
+            if cached is not None:
+                return JSONResponse(cached)
+
+            verdict = await asyncio.to_thread(service.local_verdict, endpoint, post_text)
+            if verdict is not None:
+                return JSONResponse({endpoint: verdict})
+
+            verdict = await classify_post(endpoint, post_text)
+            await asyncio.to_thread(service.remember_verdict, endpoint, cache_key, post_text, verdict)
+            return JSONResponse({endpoint: verdict})
+
+        except service.ModelResponseError as e:
+            return JSONResponse({"error": str(e)}, status_code=500)
+
+        except ModelUnavailableError as e:
+            return await unavailable_response(e, cache_key)
+
+        except Exception as e:
+            logging.error(f"Erro inesperado: {e}")
+            return JSONResponse({"error": str(e)}, status_code=500)
+
+    return route
+
+async def classify_chunk(endpoint, chunk):
+    with metrics.stage("prompt"):
+        prompt = service.chunk_prompt(endpoint, chunk)
+    batch_response = await generate([prompt], generation_config={"response_mime_type": "application/json"})
+
+    try:
+        with metrics.stage("parse"):
+            return service.parse_chunk(chunk, batch_response)
+    except (service.ModelResponseError, MalformedBatchResponse) as e:
+        logging.warning(f"Lote malformado ({len(chunk)} posts), reclassificando um a um: {e}")
+
+    async def retry(index, text):
+        try:
+            return index, await classify_post(endpoint, text)
+        except service.ModelResponseError as e:
+            logging.error(f"Falha ao classificar post {index}: {e}")
+            return index, None
+        except ModelUnavailableError as e:
+            return index, e
+
+    return await asyncio.gather(*(retry(index, text) for index, text in chunk))
+
+def classify_batch_route(endpoint):
+    async def route(request):
+        try:
+            try:
+                posts = normalize_posts(await request.json())
+            except ValueError as e:
+                return JSONResponse({"error": str(e)}, status_code=400)
+
+            if len(posts) > service.BATCH_MAX_POSTS:
+                return JSONResponse(
+                    {"error": f"Envie no máximo {service.BATCH_MAX_POSTS} posts por requisição."}, status_code=400
+                )
+
+            bypass = service.is_cache_bypass(request.query_params)
+            verdicts, keys, pending = await asyncio.to_thread(service.lookup_batch, endpoint, posts, bypass)
+
+            async def classify_or_unavailable(chunk):
+                try:
+                    return await classify_chunk(endpoint, chunk)
+                except ModelUnavailableError as e:
+                    return service.unavailable_results(chunk, e)
+
+            chunks = chunk_posts(pending, service.BATCH_CHUNK_TOKENS, service.BATCH_CHUNK_POSTS)
+            for chunk_results in await asyncio.gather(*(classify_or_unavailable(chunk) for chunk in chunks)):
+                await asyncio.to_thread(service.store_verdicts, endpoint, posts, keys, chunk_results, verdicts)
+
+            payload, status, headers = service.batch_payload(endpoint, posts, verdicts)
+            return JSONResponse(payload, status_code=status, headers=headers)
+
+        except Exception as e:
+            logging.error(f"Erro inesperado: {e}")
+            return JSONResponse({"error": str(e)}, status_code=500)
+
+    return route
+
+# The summary is shared with the WSGI app and built on threads with
+# gemini.generate and a ThreadPoolExecutor map phase. Its model calls skip
+# model_semaphore and aren't counted in in_flight. They are bounded by the
+# store instead: one build at a time, with up to SUMMARY_MAP_WORKERS calls in
+# parallel. The feed itself is fetched here on the pooled async client, so
+# the build thread finds it already parsed in the fetcher's cache.
+async def summarize_posts(request):
+    try:
+        force_refresh = service.is_cache_bypass(request.query_params)
+        if force_refresh or service.summary_store.snapshot() is None:
+            await service.feed_fetcher.get_posts_async()
+        if is_stream_requested(request.query_params, request.headers):
+            return event_stream(service.summary_events(force_refresh))
+        return JSONResponse(await asyncio.to_thread(service.summary_store.get, force_refresh))
+
+    except (httpx.HTTPError, requests.exceptions.RequestException) as req_err:
+        logging.error(f"Erro ao fazer a requisição: {req_err}")
+        return JSONResponse({"error": "Erro ao fazer a requisição para obter os posts."}, status_code=500)
+
+    except service.ModelResponseError as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+    except ModelUnavailableError as e:
+        return await unavailable_response(e)
+
+    except Exception as e:
+        logging.error(f"Erro inesperado: {e}")
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+async def stats(request):
+    return JSONResponse({
+        "cache": service.response_cache.stats(),
+        "summary_notes_cache": service.summary_notes_cache.stats(),
+        "feed": service.feed_fetcher.stats(),
+        "summary": service.summary_store.stats(),
+        "gemini": service.gemini.stats(),
+        "prefilter": service.prefilter.stats(),
+        "async": {
+            "max_concurrency": ASYNC_MAX_CONCURRENCY,
+            "in_flight": in_flight,
+        },
+    })
+
+async def prometheus_metrics(request):
+    return Response(metrics.registry.render(), headers={"Content-Type": metrics.CONTENT_TYPE})
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        route = scope["path"] if scope["path"] in ROUTE_PATHS else "unmatched"
+        metrics.current_route.set(route)
+        metrics.registry.start_flusher()
+        started = time.perf_counter()
+        observed = False
+
+        def observe(status):
+            nonlocal observed
+            if not observed:
+                observed = True
+                metrics.request_duration.observe(
+                    time.perf_counter() - started, route=route, method=scope["method"], status=status
+                )
+
+        async def send_and_observe(message):
+            if message["type"] == "http.response.start":
+                observe(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_and_observe)
+        except Exception:
+            observe(500)
+            raise
+
+def cors(*origins):
+    return [Middleware(CORSMiddleware, allow_origins=list(origins), allow_methods=["GET", "POST"])]
+
+MILHO_SITE = "https://www.milho.site"
+MILHARAL_NEWS = "https://milharal-news.onrender.com"
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    try:
+        yield
+    finally:
+        await service.feed_fetcher.aclose()
+
+app = Starlette(
+    routes=[
+        Route("/keywords", keywords, methods=["GET", "OPTIONS"], middleware=cors(MILHARAL_NEWS)),
+        Route("/question", classify_route("question"), methods=["GET", "OPTIONS"], middleware=cors(MILHARAL_NEWS)),
+        Route("/is_opportunity", classify_route("is_opportunity"), methods=["GET", "OPTIONS"], middleware=cors(MILHARAL_NEWS)),
+        Route("/question/batch", classify_batch_route("question"), methods=["POST", "OPTIONS"], middleware=cors(MILHARAL_NEWS)),
+        Route("/is_opportunity/batch", classify_batch_route("is_opportunity"), methods=["POST", "OPTIONS"], middleware=cors(MILHARAL_NEWS)),
+        Route("/summarize_posts", summarize_posts, methods=["GET", "OPTIONS"], middleware=cors(MILHO_SITE)),
+        Route("/stats", stats),
+        Route("/metrics", prometheus_metrics),
+    ],
+    middleware=[Middleware(MetricsMiddleware)],
+    lifespan=lifespan,
+)
+
+ROUTE_PATHS = {route.path for route in app.routes}
@@ -0,0 +1,79 @@
+import json
+
+
+class MalformedBatchResponse(ValueError):
+    pass
+
+
+def estimate_tokens(text):
+    return len(text) // 4 + 1
+
+
+def normalize_posts(data):
+    if isinstance(data, dict):
+        data = data.get("posts")
+    if not isinstance(data, list) or not data:
+        raise ValueError("Envie uma lista JSON de posts.")
+
+    posts = []
+    for index, item in enumerate(data):
+        if isinstance(item, str):
+            post_id, text = index, item
+        elif isinstance(item, dict):
+            post_id, text = item.get("id", index), item.get("text")
+        else:
+            post_id, text = index, None
+        if not isinstance(text, str) or not text.strip():
+            raise ValueError(f"Texto do post não fornecido (posição {index}).")
+        posts.append((post_id, text))
+    return posts
+
+
+def chunk_posts(posts, max_tokens, max_posts):
+    chunks = []
+    current = []
+    current_tokens = 0
+    for post in posts:
+        tokens = estimate_tokens(post[1])
+        if current and (current_tokens + tokens > max_tokens or len(current) >= max_posts):
+            chunks.append(current)
+            current = []
+            current_tokens = 0
+        current.append(post)
+        current_tokens += tokens
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def build_batch_prompt(criteria, positive_hint, texts):
+    items = [{"id": str(i), "text": text} for i, text in enumerate(texts)]
+    return (
+        f"{criteria} Avalie cada post da lista JSON abaixo de forma independente. "
+        f"Responda apenas com um array JSON no formato [{{\"id\": \"<id>\", \"verdict\": true}}], "
+        f"com exatamente um item para cada id, usando true se {positive_hint} e false caso contrário:\n\n"
+        f"{json.dumps(items, ensure_ascii=False)}"
+    )
+
+
+def parse_batch_verdicts(response_text, count):
+    try:
+        items = json.loads(response_text)
+    except (TypeError, ValueError) as e:
+        raise MalformedBatchResponse(f"JSON inválido: {e}")
+
+    if isinstance(items, dict):
+        items = items.get("verdicts", items.get("results"))
+    if not isinstance(items, list):
+        raise MalformedBatchResponse("A resposta não é uma lista.")
+
+    verdicts = {}
+    for item in items:
+        if not isinstance(item, dict) or not isinstance(item.get("verdict"), bool):
+            raise MalformedBatchResponse(f"Item inválido: {item!r}")
+        verdicts[str(item.get("id"))] = item["verdict"]
+
+    missing = [str(i) for i in range(count) if str(i) not in verdicts]
+    if missing:
+        raise MalformedBatchResponse(f"Ids ausentes na resposta: {', '.join(missing)}")
+    return [verdicts[str(i)] for i in range(count)]
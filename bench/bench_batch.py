@@ -0,0 +1,67 @@
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("GOOGLE_API_KEY", "stub")
+os.environ.setdefault("GEMINI_RPM", "1000000")
+os.environ.setdefault("GEMINI_BURST", "100000")
+os.environ.setdefault("PREFILTER_ENABLED", "0")
+
+import app as service  # noqa: E402
+from stub_model import StubModel  # noqa: E402
+
+WORDS = ["deploy", "kotlin", "spring", "react", "curso", "bootcamp", "remoto", "salário", "CLT", "PJ", "python", "go"]
+
+
+def make_posts(count, seed):
+    rng = random.Random(seed)
+    posts = []
+    for i in range(count):
+        words = rng.choices(WORDS, k=rng.randint(8, 40))
+        if rng.random() < 0.2:
+            words.insert(0, "vaga")
+        posts.append({"id": f"post-{i}", "text": f"{i} " + " ".join(words)})
+    return posts
+
+
+def run_single(client, endpoint, posts):
+    for post in posts:
+        response = client.get(f"/{endpoint}", query_string={"text": post["text"], "no_cache": "1"})
+        assert response.status_code == 200, response.json
+
+
+def run_batch(client, endpoint, posts):
+    response = client.post(f"/{endpoint}/batch?no_cache=1", json=posts)
+    assert response.status_code == 200, response.json
+    return response.json["results"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara o loop por post com o endpoint em lote.")
+    parser.add_argument("--posts", type=int, default=500)
+    parser.add_argument("--endpoint", choices=["is_opportunity", "question"], default="is_opportunity")
+    parser.add_argument("--latency", type=float, default=0.05, help="latência fixa do modelo stub (s)")
+    parser.add_argument("--per-token-latency", type=float, default=0.00002)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    posts = make_posts(args.posts, args.seed)
+    client = service.app.test_client()
+
+    for name, runner in (("por post", run_single), ("em lote", run_batch)):
+        service.gemini.model = StubModel(args.latency, args.per_token_latency)
+        started = time.perf_counter()
+        runner(client, args.endpoint, posts)
+        elapsed = time.perf_counter() - started
+        calls = service.gemini.model.calls
+        print(
+            f"{name:>9}: {elapsed:7.2f}s  chamadas ao modelo={calls:4d}  "
+            f"posts/chamada={len(posts) / calls:6.1f}  posts/s={len(posts) / elapsed:8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+from load_test import server_command, wait_until_ready
+
+ENDPOINTS = ("keywords", "question", "is_opportunity", "summarize_posts")
+
+SAMPLE_TEXTS = [
+    "Estamos contratando pessoa desenvolvedora Python pleno, vaga remota CLT.",
+    "Alguém sabe como configurar o gunicorn com vários workers?",
+    "Novo curso gratuito de Flask começa semana que vem, inscrições abertas.",
+    "Vaga para estágio em dados, candidate-se pelo link da gupy.",
+    "Qual a melhor forma de versionar modelos de machine learning?",
+    "Compartilhando meu artigo sobre filas assíncronas com Redis.",
+]
+
+
+def feed_posts(count):
+    return [
+        {
+            "author": {"displayName": f"Pessoa {i}", "handle": f"pessoa{i}.bsky.social"},
+            "record": {"text": f"{SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)]} (#{i})"},
+        }
+        for i in range(count)
+    ]
+
+
+def start_feed_server(count):
+    body = json.dumps(feed_posts(count)).encode("utf-8")
+
+    class FeedHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FeedHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def request_params(endpoint, i, cached):
+    params = {} if cached else {"no_cache": "1"}
+    if endpoint != "summarize_posts":
+        params["text"] = f"{SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)]} (#{i})"
+    return params
+
+
+async def run_endpoint(base_url, endpoint, requests, concurrency, cached):
+    latencies = []
+    errors = 0
+    queue = asyncio.Queue()
+    for i in range(requests):
+        queue.put_nowait(i)
+
+    async def worker(client):
+        nonlocal errors
+        while True:
+            try:
+                i = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            started = time.perf_counter()
+            try:
+                response = await client.get(f"/{endpoint}", params=request_params(endpoint, i, cached))
+                if response.status_code != 200:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput": round(len(latencies) / elapsed, 2),
+        "p50_ms": round(quantiles[49] * 1000, 1),
+        "p95_ms": round(quantiles[94] * 1000, 1),
+        "p99_ms": round(quantiles[98] * 1000, 1),
+    }
+
+
+async def fetch_token_totals(base_url):
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        response = await client.get("/metrics")
+    return [line for line in response.text.splitlines() if line.startswith("gemini_tokens_total{")]
+
+
+def report(endpoint, result):
+    print(
+        f"{endpoint:>16}: {result['requests']} requisições  throughput={result['throughput']:.1f} req/s  "
+        f"p50={result['p50_ms']:.0f}ms  p95={result['p95_ms']:.0f}ms  p99={result['p99_ms']:.0f}ms  "
+        f"erros={result['errors']}"
+    )
+
+
+def regressions(results, baseline, max_regression):
+    found = []
+    for endpoint, result in results.items():
+        previous = baseline.get(endpoint)
+        if not previous or not previous.get("p95_ms"):
+            continue
+        change = result["p95_ms"] / previous["p95_ms"] - 1
+        if change > max_regression:
+            found.append(f"{endpoint}: p95 {previous['p95_ms']:.0f}ms -> {result['p95_ms']:.0f}ms ({change:+.0%})")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Mede latência e throughput de cada endpoint contra o modelo stub e um feed local."
+    )
+    parser.add_argument("--mode", choices=["wsgi", "asgi"], default="wsgi")
+    parser.add_argument("--endpoints", nargs="+", choices=ENDPOINTS, default=list(ENDPOINTS))
+    parser.add_argument("--requests", type=int, default=200, help="requisições por endpoint")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--latency", type=float, default=0.1, help="latência do modelo stub (s)")
+    parser.add_argument("--per-token-latency", type=float, default=0.0)
+    parser.add_argument("--feed-posts", type=int, default=100)
+    parser.add_argument("--cached", action="store_true", help="não envia no_cache=1 (mede o caminho com cache)")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--json", help="salva os resultados neste arquivo")
+    parser.add_argument("--baseline", help="resultados anteriores (--json) para comparar o p95")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="aumento de p95 tolerado (fração)")
+    args = parser.parse_args()
+
+    feed = start_feed_server(args.feed_posts)
+    env = dict(
+        os.environ,
+        GOOGLE_API_KEY="stub",
+        STUB_LATENCY=str(args.latency),
+        STUB_PER_TOKEN_LATENCY=str(args.per_token_latency),
+        FEED_URL=f"http://127.0.0.1:{feed.server_port}/",
+    )
+    metrics_dir = tempfile.TemporaryDirectory()
+    if args.workers > 1:
+        env["METRICS_DIR"] = metrics_dir.name
+    server = subprocess.Popen(server_command(args.mode, args.port, args.workers), env=env)
+    base_url = f"http://127.0.0.1:{args.port}"
+    results = {}
+    try:
+        asyncio.run(wait_until_ready(base_url))
+        print(
+            f"{args.mode}: {args.workers} workers, concorrência {args.concurrency}, "
+            f"modelo stub {args.latency * 1000:.0f}ms, feed com {args.feed_posts} posts"
+        )
+        for endpoint in args.endpoints:
+            results[endpoint] = asyncio.run(
+                run_endpoint(base_url, endpoint, args.requests, args.concurrency, args.cached)
+            )
+            report(endpoint, results[endpoint])
+        print(f"tokens (total da execução, {args.workers} workers):")
+        for line in asyncio.run(fetch_token_totals(base_url)):
+            print(f"  {line}")
+    finally:
+        server.terminate()
+        server.wait()
+        feed.shutdown()
+        metrics_dir.cleanup()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            found = regressions(results, json.load(f), args.max_regression)
+        if found:
+            print("Regressões de latência acima do limite:")
+            for line in found:
+                print(f"  {line}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
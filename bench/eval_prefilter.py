@@ -0,0 +1,76 @@
+import argparse
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from prefilter import HashedLinearModel, Prefilter, load_samples  # noqa: E402
+
+
+def evaluate(prefilter, samples):
+    counts = {"local": 0, "agree": 0, "false_negative": 0, "false_positive": 0}
+    for text, label in samples:
+        verdict = prefilter.decide(text)
+        if verdict is None:
+            continue
+        counts["local"] += 1
+        if verdict == label:
+            counts["agree"] += 1
+        elif label:
+            counts["false_negative"] += 1
+        else:
+            counts["false_positive"] += 1
+    return counts
+
+
+def report(name, counts, total):
+    local = counts["local"]
+    agreement = counts["agree"] / local if local else 0.0
+    print(
+        f"{name:>14}: chamadas evitadas={local}/{total} ({local / total:.1%})  "
+        f"concordância com o modelo={agreement:.2%}  "
+        f"falsos negativos={counts['false_negative']}  falsos positivos={counts['false_positive']}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Mede a concordância do pré-filtro local com os vereditos registrados do modelo."
+    )
+    parser.add_argument("corpus", help="JSONL com {\"text\": ..., \"label\": true|false} (ex.: PREFILTER_LOG)")
+    parser.add_argument("--model", help="modelo linear já treinado (JSON)")
+    parser.add_argument("--train-out", help="treina um modelo linear e salva neste caminho")
+    parser.add_argument("--holdout", type=float, default=0.2, help="fração do corpus reservada para avaliação")
+    parser.add_argument("--epochs", type=int, default=5)
+    parser.add_argument("--negative-threshold", type=float, default=0.05)
+    parser.add_argument("--positive-threshold", type=float, default=0.98)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    samples = load_samples(args.corpus)
+    if not samples:
+        sys.exit("Corpus vazio.")
+
+    model = HashedLinearModel.load(args.model) if args.model else None
+    evaluation = samples
+
+    if args.train_out:
+        random.Random(args.seed).shuffle(samples)
+        split = int(len(samples) * (1 - args.holdout))
+        training, evaluation = samples[:split], samples[split:] or samples
+        model = HashedLinearModel().train(training, epochs=args.epochs, seed=args.seed)
+        model.save(args.train_out)
+        print(f"Modelo treinado com {len(training)} posts e salvo em {args.train_out}.")
+
+    positives = sum(1 for _, label in evaluation if label)
+    print(f"Avaliando {len(evaluation)} posts ({positives} vagas segundo o modelo).")
+
+    thresholds = {"negative_threshold": args.negative_threshold, "positive_threshold": args.positive_threshold}
+    report("regras", evaluate(Prefilter(**thresholds), evaluation), len(evaluation))
+    if model is not None:
+        report("regras+linear", evaluate(Prefilter(model=model, **thresholds), evaluation), len(evaluation))
+
+
+if __name__ == "__main__":
+    main()
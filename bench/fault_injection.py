@@ -0,0 +1,108 @@
+import argparse
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from google.api_core import exceptions as google_exceptions  # noqa: E402
+
+from gemini_client import CircuitOpenError, GeminiClient, ModelUnavailableError  # noqa: E402
+from stub_model import StubModel  # noqa: E402
+
+
+def run_phase(client, name, requests, concurrency, duplicates):
+    def call(i):
+        prompt = f'Este texto refere-se a um anúncio de vaga de emprego?\n\n"post {i % max(1, requests // duplicates)}"'
+        try:
+            client.generate([prompt])
+            return "ok"
+        except ModelUnavailableError as e:
+            return type(e).__name__
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = Counter(pool.map(call, range(requests)))
+    elapsed = time.perf_counter() - started
+
+    stats = client.stats()
+    print(f"\n== {name} ({elapsed:.2f}s)")
+    print("   resultados:", dict(outcomes))
+    print(f"   chamadas ao modelo stub: {client.model.calls}  falhas injetadas: {client.model.failures}")
+    print(
+        f"   circuito={stats['circuit']}  coalescidas={stats['coalesced']}  retries={stats['retries']}  "
+        f"curto-circuitadas={stats['short_circuited']}  taxa={stats['rate_per_minute']}/min  "
+        f"espera no limitador={stats['throttled_seconds']}s"
+    )
+
+
+def check_probe_release(client, reset_timeout):
+    # A half-open probe rejected for a non-retryable reason must not leave
+    # the circuit stuck refusing every later call.
+    model = client.model
+    model.error_rate = 1.0
+    for _ in range(client.breaker.failure_threshold):
+        try:
+            client.generate(["probe"])
+        except ModelUnavailableError:
+            pass
+    time.sleep(reset_timeout)
+
+    errors, model.errors = model.errors, (google_exceptions.InvalidArgument,)
+    try:
+        client.generate(["probe inválido"])
+    except google_exceptions.InvalidArgument:
+        pass
+    model.errors, model.error_rate = errors, 0.0
+
+    try:
+        client.generate(["probe após recuperação"])
+    except CircuitOpenError:
+        sys.exit("\n== sonda do circuito: FALHOU, circuito preso em half_open")
+    print(f"\n== sonda do circuito: ok (circuito={client.breaker.state})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exercita o GeminiClient contra um modelo stub com falhas injetadas.")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duplicates", type=int, default=4, help="quantas requisições compartilham o mesmo prompt")
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0.3)
+    parser.add_argument("--rpm", type=float, default=6000)
+    parser.add_argument("--reset-timeout", type=float, default=1.0)
+    args = parser.parse_args()
+
+    model = StubModel(latency=args.latency, jitter=args.latency, seed=1)
+    client = GeminiClient(
+        model,
+        rate_per_minute=args.rpm,
+        burst=args.concurrency,
+        max_wait=5,
+        max_retries=3,
+        backoff_base=0.02,
+        backoff_max=0.2,
+        failure_threshold=5,
+        reset_timeout=args.reset_timeout,
+    )
+
+    model.error_rate = 0.0
+    run_phase(client, "saudável", args.requests, args.concurrency, args.duplicates)
+
+    model.error_rate = args.error_rate
+    run_phase(client, f"{args.error_rate:.0%} de erros", args.requests, args.concurrency, args.duplicates)
+
+    model.error_rate = 1.0
+    run_phase(client, "indisponível", args.requests, args.concurrency, args.duplicates)
+
+    model.error_rate = 0.0
+    time.sleep(args.reset_timeout)
+    run_phase(client, "recuperação", args.requests, args.concurrency, args.duplicates)
+
+    check_probe_release(client, args.reset_timeout)
+
+
+if __name__ == "__main__":
+    main()
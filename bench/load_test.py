@@ -0,0 +1,106 @@
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def server_command(mode, port, workers):
+    if mode == "wsgi":
+        return [
+            sys.executable, "-m", "gunicorn", "--chdir", BENCH_DIR,
+            "-w", str(workers), "-b", f"127.0.0.1:{port}", "--log-level", "warning",
+            "stub_server:app",
+        ]
+    return [
+        sys.executable, "-m", "uvicorn", "--app-dir", BENCH_DIR,
+        "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers), "--log-level", "warning",
+        "stub_server:asgi_app",
+    ]
+
+
+async def wait_until_ready(base_url, timeout=30):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                await client.get(f"{base_url}/stats")
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f"Servidor não respondeu em {timeout}s")
+
+
+async def run_load(base_url, path, requests, concurrency):
+    latencies = []
+    errors = 0
+    queue = asyncio.Queue()
+    for i in range(requests):
+        queue.put_nowait(i)
+
+    async def worker(client):
+        nonlocal errors
+        while True:
+            try:
+                i = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            started = time.perf_counter()
+            try:
+                response = await client.get(path, params={"text": f"post {i}: vaga python remoto", "no_cache": "1"})
+                if response.status_code != 200:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return latencies, errors, elapsed
+
+
+def report(mode, latencies, errors, elapsed):
+    latencies.sort()
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    print(
+        f"{mode}: {len(latencies)} requisições em {elapsed:.2f}s  "
+        f"throughput={len(latencies) / elapsed:.1f} req/s  "
+        f"p50={quantiles[49] * 1000:.0f}ms  p95={quantiles[94] * 1000:.0f}ms  erros={errors}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga do servidor WSGI vs ASGI com modelo stub.")
+    parser.add_argument("--mode", choices=["wsgi", "asgi", "both"], default="both")
+    parser.add_argument("--path", default="/is_opportunity")
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.5, help="latência do modelo stub (s)")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    env = dict(os.environ, STUB_LATENCY=str(args.latency), GOOGLE_API_KEY="stub")
+    modes = ["wsgi", "asgi"] if args.mode == "both" else [args.mode]
+    for mode in modes:
+        server = subprocess.Popen(server_command(mode, args.port, args.workers), env=env)
+        try:
+            base_url = f"http://127.0.0.1:{args.port}"
+            asyncio.run(wait_until_ready(base_url))
+            report(mode, *asyncio.run(run_load(base_url, args.path, args.requests, args.concurrency)))
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
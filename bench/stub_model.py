@@ -0,0 +1,118 @@
+import asyncio
+import json
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+from google.api_core import exceptions as google_exceptions
+
+
+def _tokens(text):
+    return len(text) // 4 + 1 if text else 0
+
+
+def _response(text, prompt=""):
+    part = SimpleNamespace(text=text)
+    candidate = SimpleNamespace(content=SimpleNamespace(parts=[part]))
+    usage = SimpleNamespace(
+        prompt_token_count=_tokens(prompt),
+        candidates_token_count=_tokens(text),
+        total_token_count=_tokens(prompt) + _tokens(text),
+    )
+    return SimpleNamespace(candidates=[candidate], text=text, usage_metadata=usage)
+
+
+def _quoted_text(prompt):
+    body = prompt.rsplit("\n\n", 1)[-1]
+    return body[1:-1] if body.startswith('"') and body.endswith('"') else body
+
+
+def is_job_post(text):
+    text = text.lower()
+    return any(word in text for word in ("vaga", "contratando", "hiring"))
+
+
+class StubModel:
+    def __init__(self, latency=0.5, per_token_latency=0.0, stream_chunks=4, error_rate=0.0, jitter=0.0, seed=None):
+        self.latency = latency
+        self.per_token_latency = per_token_latency
+        self.stream_chunks = stream_chunks
+        self.error_rate = error_rate
+        self.jitter = jitter
+        self.errors = (google_exceptions.ResourceExhausted, google_exceptions.ServiceUnavailable)
+        self.calls = 0
+        self.failures = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _delay(self, prompt):
+        with self._lock:
+            self.calls += 1
+            jitter = self._random.uniform(0, self.jitter)
+        return self.latency + jitter + self.per_token_latency * (len(prompt) // 4)
+
+    def _maybe_fail(self):
+        with self._lock:
+            if self._random.random() >= self.error_rate:
+                return
+            self.failures += 1
+            error = self._random.choice(self.errors)
+        raise error("Erro injetado pelo modelo de teste.")
+
+    def _reply(self, contents, generation_config=None):
+        prompt = contents[0]
+        if generation_config and generation_config.get("response_mime_type") == "application/json":
+            items = json.loads(prompt.rsplit("\n\n", 1)[-1])
+            verdicts = [{"id": item["id"], "verdict": is_job_post(item["text"])} for item in items]
+            return _response(json.dumps(verdicts), prompt)
+
+        if prompt.startswith("Quais são as principais palavras-chave"):
+            words = sorted(set(_quoted_text(prompt).split()))[:20]
+            return _response(", ".join(words), prompt)
+
+        if prompt.startswith("Extraia"):
+            return _response("- Anotação gerada pelo modelo de teste.", prompt)
+
+        if prompt.startswith("Receba"):
+            return _response("## Seção 1\nResumo gerado pelo modelo de teste.", prompt)
+
+        verdict = is_job_post(_quoted_text(prompt))
+        return _response(json.dumps({"verdict": verdict}), prompt)
+
+    def _pieces(self, contents, generation_config):
+        reply = self._reply(contents, generation_config)
+        size = max(1, len(reply.text) // self.stream_chunks)
+        pieces = [_response(reply.text[i:i + size]) for i in range(0, len(reply.text), size)]
+        pieces[-1].usage_metadata = reply.usage_metadata
+        return pieces
+
+    def _stream(self, delay, contents, generation_config):
+        pieces = self._pieces(contents, generation_config)
+        self._maybe_fail()
+        for piece in pieces:
+            time.sleep(delay / len(pieces))
+            yield piece
+
+    async def _stream_async(self, delay, contents, generation_config):
+        pieces = self._pieces(contents, generation_config)
+        self._maybe_fail()
+        for piece in pieces:
+            await asyncio.sleep(delay / len(pieces))
+            yield piece
+
+    def generate_content(self, contents, generation_config=None, stream=False, **kwargs):
+        delay = self._delay(contents[0])
+        if stream:
+            return self._stream(delay, contents, generation_config)
+        time.sleep(delay)
+        self._maybe_fail()
+        return self._reply(contents, generation_config)
+
+    async def generate_content_async(self, contents, generation_config=None, stream=False, **kwargs):
+        delay = self._delay(contents[0])
+        if stream:
+            return self._stream_async(delay, contents, generation_config)
+        await asyncio.sleep(delay)
+        self._maybe_fail()
+        return self._reply(contents, generation_config)
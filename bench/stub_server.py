@@ -0,0 +1,20 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("GOOGLE_API_KEY", "stub")
+os.environ.setdefault("GEMINI_RPM", "1000000")
+os.environ.setdefault("GEMINI_BURST", "100000")
+os.environ.setdefault("PREFILTER_ENABLED", "0")
+
+import app as service  # noqa: E402
+import asgi  # noqa: E402
+from stub_model import StubModel  # noqa: E402
+
+service.gemini.model = StubModel(
+    latency=float(os.getenv("STUB_LATENCY", "0.5")),
+    per_token_latency=float(os.getenv("STUB_PER_TOKEN_LATENCY", "0")),
+)
+
+app = service.app
+asgi_app = asgi.app
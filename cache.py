@@ -0,0 +1,152 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+
+from cachetools import TTLCache
+
+
+class _CountingTTLCache(TTLCache):
+    def __init__(self, maxsize, ttl):
+        super().__init__(maxsize, ttl)
+        self.evictions = 0
+
+    def popitem(self):
+        item = super().popitem()
+        self.evictions += 1
+        return item
+
+
+class _SQLiteTier:
+    def __init__(self, path, ttl, max_rows=100000, purge_every=256):
+        self.path = path
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self.purge_every = purge_every
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def _connect(self):
+        # Connections are opened lazily and per process, so workers forked
+        # by gunicorn --preload never share an inherited connection.
+        pid = os.getpid()
+        if getattr(self._local, "pid", None) != pid:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS responses_expires_at ON responses (expires_at)")
+            self._local.conn = conn
+            self._local.pid = pid
+        return self._local.conn
+
+    def get(self, key):
+        row = self._connect().execute(
+            "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        value, expires_at = row
+        if expires_at <= time.time():
+            self._connect().execute("DELETE FROM responses WHERE key = ?", (key,))
+            return None
+        return json.loads(value)
+
+    def set(self, key, value):
+        self._connect().execute(
+            "INSERT OR REPLACE INTO responses (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, json.dumps(value), time.time() + self.ttl),
+        )
+        with self._lock:
+            self._writes += 1
+            purge = self._writes % self.purge_every == 0
+        if purge:
+            self.purge()
+
+    def purge(self):
+        conn = self._connect()
+        conn.execute("DELETE FROM responses WHERE expires_at <= ?", (time.time(),))
+        conn.execute(
+            "DELETE FROM responses WHERE rowid IN ("
+            "SELECT rowid FROM responses ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_rows,),
+        )
+
+
+class ResponseCache:
+    def __init__(self, maxsize=1024, ttl=86400, db_path=None, db_max_rows=100000):
+        self._memory = _CountingTTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self._disk = _SQLiteTier(db_path, ttl, db_max_rows) if db_path else None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls, size_variable="RESPONSE_CACHE_SIZE", default_size=1024):
+        return cls(
+            maxsize=int(os.getenv(size_variable, str(default_size))),
+            ttl=float(os.getenv("RESPONSE_CACHE_TTL", "86400")),
+            db_path=os.getenv("RESPONSE_CACHE_DB") or None,
+            db_max_rows=int(os.getenv("RESPONSE_CACHE_DB_ROWS", "100000")),
+        )
+
+    @staticmethod
+    def make_key(endpoint, text, model_name, prompt_version):
+        normalized = " ".join(unicodedata.normalize("NFC", text).split())
+        raw = "\x1f".join([endpoint, model_name, str(prompt_version), normalized])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self.hits += 1
+                return value
+
+        if self._disk is not None:
+            try:
+                value = self._disk.get(key)
+            except sqlite3.Error as e:
+                logging.warning(f"Falha ao ler o cache em disco: {e}")
+                value = None
+            if value is not None:
+                with self._lock:
+                    self._memory[key] = value
+                    self.hits += 1
+                    self.disk_hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, value):
+        with self._lock:
+            self._memory[key] = value
+
+        if self._disk is not None:
+            try:
+                self._disk.set(key, value)
+            except sqlite3.Error as e:
+                logging.warning(f"Falha ao gravar o cache em disco: {e}")
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self._memory.evictions,
+                "size": len(self._memory),
+                "maxsize": self._memory.maxsize,
+                "disk": self._disk is not None,
+            }
@@ -0,0 +1,184 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import metrics
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class FeedFetcher:
+    def __init__(self, url, timeout=10, ttl=60, retries=3, backoff=0.5, pool_size=10):
+        self.url = url
+        self.timeout = timeout
+        self.ttl = ttl
+        self.retries = retries
+        self.backoff = backoff
+        self.pool_size = pool_size
+
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=("GET",),
+            respect_retry_after_header=True,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        # The async client is created on first use, inside the running loop.
+        self._async_client = None
+
+        self._lock = threading.Lock()
+        self._in_flight = None
+        self._in_flight_async = None
+        self._posts = None
+        self._fetched_at = 0.0
+        self._etag = None
+        self._last_modified = None
+
+        self.downloads = 0
+        self.not_modified = 0
+        self.cache_hits = 0
+        self.shared_fetches = 0
+
+    @classmethod
+    def from_env(cls, url):
+        return cls(
+            url,
+            timeout=float(os.getenv("FEED_TIMEOUT", "10")),
+            ttl=float(os.getenv("FEED_CACHE_TTL", "60")),
+            retries=int(os.getenv("FEED_RETRIES", "3")),
+        )
+
+    def _is_fresh(self):
+        return self._posts is not None and time.monotonic() - self._fetched_at < self.ttl
+
+    def get_posts(self):
+        with self._lock:
+            if self._is_fresh():
+                self.cache_hits += 1
+                return self._posts
+
+            flight = self._in_flight
+            leader = flight is None
+            if leader:
+                flight = self._in_flight = Future()
+            else:
+                self.shared_fetches += 1
+
+        if not leader:
+            return flight.result()
+
+        try:
+            posts = self._fetch()
+            flight.set_result(posts)
+            return posts
+        except Exception as e:
+            flight.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._in_flight = None
+
+    async def get_posts_async(self):
+        with self._lock:
+            if self._is_fresh():
+                self.cache_hits += 1
+                return self._posts
+
+        flight = self._in_flight_async
+        if flight is not None:
+            with self._lock:
+                self.shared_fetches += 1
+            return await asyncio.shield(flight)
+
+        flight = self._in_flight_async = asyncio.get_running_loop().create_future()
+        try:
+            posts = await self._fetch_async()
+            flight.set_result(posts)
+            return posts
+        except asyncio.CancelledError:
+            flight.cancel()
+            raise
+        except Exception as e:
+            flight.set_exception(e)
+            flight.exception()
+            raise
+        finally:
+            self._in_flight_async = None
+
+    async def aclose(self):
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+
+    def _conditional_headers(self):
+        headers = {}
+        if self._posts is not None:
+            if self._etag:
+                headers["If-None-Match"] = self._etag
+            if self._last_modified:
+                headers["If-Modified-Since"] = self._last_modified
+        return headers
+
+    def _fetch(self):
+        with metrics.stage("feed_fetch"):
+            response = self.session.get(self.url, headers=self._conditional_headers(), timeout=(3.05, self.timeout))
+        return self._accept(response)
+
+    async def _fetch_async(self):
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout, connect=3.05),
+                limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size),
+                transport=httpx.AsyncHTTPTransport(retries=self.retries),
+            )
+
+        headers = self._conditional_headers()
+        for attempt in range(self.retries + 1):
+            with metrics.stage("feed_fetch"):
+                response = await self._async_client.get(self.url, headers=headers)
+            if response.status_code not in RETRY_STATUSES or attempt == self.retries:
+                break
+            await asyncio.sleep(self.backoff * 2 ** attempt)
+        return self._accept(response)
+
+    # Works for both requests and httpx responses.
+    def _accept(self, response):
+        if response.status_code == 304 and self._posts is not None:
+            logging.info("Feed não modificado desde a última requisição.")
+            with self._lock:
+                self.not_modified += 1
+                self._fetched_at = time.monotonic()
+            return self._posts
+
+        response.raise_for_status()
+        posts = response.json()
+
+        with self._lock:
+            self.downloads += 1
+            self._posts = posts
+            self._fetched_at = time.monotonic()
+            self._etag = response.headers.get("ETag")
+            self._last_modified = response.headers.get("Last-Modified")
+        return posts
+
+    def stats(self):
+        with self._lock:
+            return {
+                "downloads": self.downloads,
+                "not_modified": self.not_modified,
+                "cache_hits": self.cache_hits,
+                "shared_fetches": self.shared_fetches,
+            }
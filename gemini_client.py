@@ -0,0 +1,375 @@
+import asyncio
+import hashlib
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future
+
+from google.api_core import exceptions as google_exceptions
+
+import metrics
+
+RETRYABLE_ERRORS = (
+    google_exceptions.ResourceExhausted,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.InternalServerError,
+    google_exceptions.DeadlineExceeded,
+    TimeoutError,
+    ConnectionError,
+)
+
+
+class ModelUnavailableError(Exception):
+    def __init__(self, message, retry_after=1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(ModelUnavailableError):
+    pass
+
+
+class RateLimitedError(ModelUnavailableError):
+    pass
+
+
+class TokenBucket:
+    def __init__(self, rate_per_minute, burst, min_fraction=0.1, recovery_seconds=60, penalty_cooldown=1.0):
+        self.max_rate = rate_per_minute / 60
+        self.min_rate = self.max_rate * min_fraction
+        self.rate = self.max_rate
+        self.burst = burst
+        self.recovery_seconds = recovery_seconds
+        self.penalty_cooldown = penalty_cooldown
+        self.tokens = float(burst)
+        self.updated_at = time.monotonic()
+        self.penalized_at = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self.updated_at
+        recovered = (self.max_rate - self.min_rate) * elapsed / self.recovery_seconds
+        self.rate = min(self.max_rate, self.rate + recovered)
+        self.tokens = min(self.burst, self.tokens + elapsed * self.rate)
+        self.updated_at = now
+
+    def reserve(self, max_wait):
+        with self._lock:
+            self._refill(time.monotonic())
+            wait = max(0.0, (1 - self.tokens) / self.rate)
+            if wait > max_wait:
+                raise RateLimitedError("Cota do modelo esgotada, tente novamente em instantes.", retry_after=wait)
+            self.tokens -= 1
+            return wait
+
+    def penalize(self):
+        with self._lock:
+            now = time.monotonic()
+            if now - self.penalized_at < self.penalty_cooldown:
+                return
+            self._refill(now)
+            self.penalized_at = now
+            self.rate = max(self.min_rate, self.rate / 2)
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            if self.state == "closed":
+                return False
+            remaining = self.reset_timeout - (time.monotonic() - self.opened_at)
+            if self.state == "open" and remaining <= 0:
+                self.state = "half_open"
+                return True
+            raise CircuitOpenError("Serviço do modelo temporariamente indisponível.", retry_after=max(remaining, 1.0))
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+
+    def release_probe(self):
+        # A probe that ended without a verdict on the model's health (rate
+        # limited locally, cancelled, rejected request) hands the half-open
+        # slot to the next caller instead of holding it forever.
+        with self._lock:
+            if self.state == "half_open":
+                self.state = "open"
+                self.opened_at = time.monotonic() - self.reset_timeout
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    logging.warning(f"Circuito do modelo aberto após {self.failures} falhas seguidas.")
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+
+class GeminiClient:
+    def __init__(
+        self,
+        model,
+        rate_per_minute=60,
+        burst=10,
+        max_wait=30,
+        max_retries=3,
+        backoff_base=0.5,
+        backoff_max=8,
+        failure_threshold=5,
+        reset_timeout=30,
+    ):
+        self.model = model
+        self.bucket = TokenBucket(rate_per_minute, burst)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.max_wait = max_wait
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self._in_flight_async = {}
+
+        self.calls = 0
+        self.coalesced = 0
+        self.retries = 0
+        self.failures = 0
+        self.short_circuited = 0
+        self.throttled_seconds = 0.0
+
+    @classmethod
+    def from_env(cls, model):
+        # GEMINI_RPM and GEMINI_BURST are the account quota. The bucket lives
+        # in each process, so the quota is split across the server workers
+        # (GEMINI_WORKERS, or gunicorn's WEB_CONCURRENCY).
+        workers = max(1, int(os.getenv("GEMINI_WORKERS", os.getenv("WEB_CONCURRENCY", "1"))))
+        return cls(
+            model,
+            rate_per_minute=float(os.getenv("GEMINI_RPM", "60")) / workers,
+            burst=max(1, int(os.getenv("GEMINI_BURST", "10")) // workers),
+            max_wait=float(os.getenv("GEMINI_MAX_WAIT", "30")),
+            max_retries=int(os.getenv("GEMINI_MAX_RETRIES", "3")),
+            failure_threshold=int(os.getenv("GEMINI_BREAKER_FAILURES", "5")),
+            reset_timeout=float(os.getenv("GEMINI_BREAKER_RESET", "30")),
+        )
+
+    @staticmethod
+    def _request_key(contents, kwargs):
+        raw = repr((contents, sorted(kwargs.items())))
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _before_attempt(self):
+        try:
+            probe = self.breaker.before_call()
+        except CircuitOpenError:
+            with self._lock:
+                self.short_circuited += 1
+            raise
+        try:
+            wait = self.bucket.reserve(self.max_wait)
+        except RateLimitedError:
+            if probe:
+                self.breaker.release_probe()
+            raise
+        with self._lock:
+            self.calls += 1
+            self.throttled_seconds += wait
+        return wait, probe
+
+    def _after_failure(self, e, attempt, final=False):
+        metrics.model_errors.inc(error=type(e).__name__)
+        if isinstance(e, google_exceptions.ResourceExhausted):
+            self.bucket.penalize()
+        if final or attempt >= self.max_retries:
+            self.breaker.record_failure()
+            with self._lock:
+                self.failures += 1
+            raise ModelUnavailableError(f"Falha ao chamar o modelo: {e}", retry_after=self.backoff_max) from e
+        with self._lock:
+            self.retries += 1
+        backoff = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        logging.warning(f"Erro temporário do modelo ({e}), nova tentativa em {backoff:.2f}s.")
+        return backoff
+
+    def _after_success(self, response):
+        self.breaker.record_success()
+        metrics.record_usage(response)
+
+    # A half-open probe gets a single attempt: its failure reopens the
+    # circuit, and any other way out of the attempt releases the probe.
+    def _call(self, contents, kwargs):
+        attempt = 0
+        while True:
+            wait, probe = self._before_attempt()
+            try:
+                time.sleep(wait)
+                with metrics.stage("model"):
+                    response = self.model.generate_content(contents, **kwargs)
+            except RETRYABLE_ERRORS as e:
+                backoff = self._after_failure(e, attempt, final=probe)
+            except Exception as e:
+                metrics.model_errors.inc(error=type(e).__name__)
+                raise
+            else:
+                self._after_success(response)
+                return response
+            finally:
+                if probe:
+                    self.breaker.release_probe()
+            time.sleep(backoff)
+            attempt += 1
+
+    async def _call_async(self, contents, kwargs):
+        attempt = 0
+        while True:
+            wait, probe = self._before_attempt()
+            try:
+                await asyncio.sleep(wait)
+                with metrics.stage("model"):
+                    response = await self.model.generate_content_async(contents, **kwargs)
+            except RETRYABLE_ERRORS as e:
+                backoff = self._after_failure(e, attempt, final=probe)
+            except Exception as e:
+                metrics.model_errors.inc(error=type(e).__name__)
+                raise
+            else:
+                self._after_success(response)
+                return response
+            finally:
+                if probe:
+                    self.breaker.release_probe()
+            await asyncio.sleep(backoff)
+            attempt += 1
+
+    # Streaming errors (429/503 included) surface while the chunks are read,
+    # so the outcome is recorded when the stream ends. Only a stream that
+    # fails before its first chunk is retried: chunks already handed out
+    # can't be taken back.
+    def _stream(self, contents, kwargs):
+        attempt = 0
+        while True:
+            wait, probe = self._before_attempt()
+            chunk = None
+            try:
+                time.sleep(wait)
+                with metrics.stage("model"):
+                    response = self.model.generate_content(contents, **kwargs)
+                for chunk in response:
+                    yield chunk
+            except RETRYABLE_ERRORS as e:
+                backoff = self._after_failure(e, attempt, final=probe or chunk is not None)
+            except Exception as e:
+                metrics.model_errors.inc(error=type(e).__name__)
+                raise
+            else:
+                self._after_success(chunk)
+                return
+            finally:
+                if probe:
+                    self.breaker.release_probe()
+            time.sleep(backoff)
+            attempt += 1
+
+    async def _stream_async(self, contents, kwargs):
+        attempt = 0
+        while True:
+            wait, probe = self._before_attempt()
+            chunk = None
+            try:
+                await asyncio.sleep(wait)
+                with metrics.stage("model"):
+                    response = await self.model.generate_content_async(contents, **kwargs)
+                async for chunk in response:
+                    yield chunk
+            except RETRYABLE_ERRORS as e:
+                backoff = self._after_failure(e, attempt, final=probe or chunk is not None)
+            except Exception as e:
+                metrics.model_errors.inc(error=type(e).__name__)
+                raise
+            else:
+                self._after_success(chunk)
+                return
+            finally:
+                if probe:
+                    self.breaker.release_probe()
+            await asyncio.sleep(backoff)
+            attempt += 1
+
+    def generate(self, contents, **kwargs):
+        if kwargs.get("stream"):
+            return self._stream(contents, kwargs)
+
+        key = self._request_key(contents, kwargs)
+        with self._lock:
+            flight = self._in_flight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._in_flight[key] = Future()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return flight.result()
+
+        try:
+            response = self._call(contents, kwargs)
+            flight.set_result(response)
+            return response
+        except Exception as e:
+            flight.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+    async def generate_async(self, contents, **kwargs):
+        if kwargs.get("stream"):
+            return self._stream_async(contents, kwargs)
+
+        key = self._request_key(contents, kwargs)
+        flight = self._in_flight_async.get(key)
+        if flight is not None:
+            with self._lock:
+                self.coalesced += 1
+            return await asyncio.shield(flight)
+
+        flight = self._in_flight_async[key] = asyncio.get_running_loop().create_future()
+        try:
+            response = await self._call_async(contents, kwargs)
+            flight.set_result(response)
+            return response
+        except asyncio.CancelledError:
+            flight.cancel()
+            raise
+        except Exception as e:
+            flight.set_exception(e)
+            flight.exception()
+            raise
+        finally:
+            del self._in_flight_async[key]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "coalesced": self.coalesced,
+                "retries": self.retries,
+                "failures": self.failures,
+                "short_circuited": self.short_circuited,
+                "throttled_seconds": round(self.throttled_seconds, 3),
+                "rate_per_minute": round(self.bucket.rate * 60, 2),
+                "circuit": self.breaker.state,
+                "consecutive_failures": self.breaker.failures,
+            }
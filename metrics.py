@@ -0,0 +1,278 @@
+import atexit
+import bisect
+import contextlib
+import contextvars
+import glob
+import json
+import logging
+import os
+import threading
+import time
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+current_route = contextvars.ContextVar("current_route", default="background")
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+def _is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return dict(self._values)
+
+    @staticmethod
+    def merge(value, other):
+        return value + other
+
+    def render(self, samples):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(samples.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextlib.contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self):
+        with self._lock:
+            return {key: (list(counts), total) for key, (counts, total) in self._values.items()}
+
+    @staticmethod
+    def merge(value, other):
+        return [a + b for a, b in zip(value[0], other[0])], value[1] + other[1]
+
+    def render(self, samples):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        names = self.labelnames + ("le",)
+        for key, (counts, total) in sorted(samples.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(names, key + (bound,))} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    # With a directory (METRICS_DIR), every process writes its samples to
+    # metrics-<pid>.json and a scrape of any worker merges all of them, so
+    # counters don't jump between workers. Counters and histograms of exited
+    # workers keep counting; gauges only come from live ones, per pid.
+    def __init__(self, directory=None, flush_interval=5.0):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._metrics = []
+        self._collectors = []
+        self._flusher_pid = None
+        self._flusher_lock = threading.Lock()
+
+    def counter(self, name, documentation, labelnames=()):
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collect):
+        # collect() returns (name, type, documentation, {labels: value}) tuples
+        # read at scrape time from components that keep their own counters.
+        self._collectors.append(collect)
+
+    def _collect(self):
+        for collect in self._collectors:
+            yield from collect()
+
+    def start_flusher(self):
+        # Started per process on first use, so workers forked after import
+        # (gunicorn --preload) each get their own thread.
+        if not self.directory or self._flusher_pid == os.getpid():
+            return
+
+        with self._flusher_lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+
+            def loop():
+                while True:
+                    time.sleep(self.flush_interval)
+                    self.flush()
+
+            threading.Thread(target=loop, name="metrics-flush", daemon=True).start()
+            atexit.register(self.flush)
+
+    def flush(self):
+        snapshot = {
+            "metrics": {
+                metric.name: [[list(key), value] for key, value in metric.samples().items()]
+                for metric in self._metrics
+            },
+            "collected": [
+                [name, kind, documentation, [[[list(pair) for pair in labels], value] for labels, value in samples.items()]]
+                for name, kind, documentation, samples in self._collect()
+            ],
+        }
+        path = os.path.join(self.directory, f"metrics-{os.getpid()}.json")
+        try:
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(snapshot, f)
+            os.replace(path + ".tmp", path)
+        except OSError as e:
+            logging.warning(f"Falha ao gravar as métricas em {path}: {e}")
+
+    def _load(self):
+        processes = []
+        for path in glob.glob(os.path.join(self.directory, "metrics-*.json")):
+            try:
+                pid = int(os.path.basename(path)[len("metrics-"):-len(".json")])
+                with open(path, encoding="utf-8") as f:
+                    processes.append((pid, json.load(f)))
+            except (OSError, ValueError) as e:
+                logging.warning(f"Ignorando arquivo de métricas {path}: {e}")
+        return processes
+
+    def _render_merged(self):
+        self.flush()
+        processes = self._load()
+        lines = []
+
+        for metric in self._metrics:
+            merged = {}
+            for _, snapshot in processes:
+                for key, value in snapshot["metrics"].get(metric.name, []):
+                    key = tuple(key)
+                    merged[key] = metric.merge(merged[key], value) if key in merged else value
+            lines.extend(metric.render(merged))
+
+        collected = {}
+        for pid, snapshot in processes:
+            alive = _is_alive(pid)
+            for name, kind, documentation, samples in snapshot["collected"]:
+                _, _, merged = collected.setdefault(name, (kind, documentation, {}))
+                for labels, value in samples:
+                    labels = tuple(tuple(pair) for pair in labels)
+                    if kind == "gauge":
+                        if alive:
+                            merged[labels + (("pid", pid),)] = value
+                    else:
+                        merged[labels] = merged.get(labels, 0) + value
+        lines.extend(self._render_collected(
+            (name, kind, documentation, samples) for name, (kind, documentation, samples) in collected.items()
+        ))
+        return lines
+
+    @staticmethod
+    def _render_collected(collected):
+        lines = []
+        for name, kind, documentation, samples in collected:
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples.items():
+                names, values = zip(*labels) if labels else ((), ())
+                lines.append(f"{name}{_format_labels(names, values)} {value}")
+        return lines
+
+    def render(self):
+        if self.directory:
+            lines = self._render_merged()
+        else:
+            lines = []
+            for metric in self._metrics:
+                lines.extend(metric.render(metric.samples()))
+            lines.extend(self._render_collected(self._collect()))
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry(
+    directory=os.getenv("METRICS_DIR") or None,
+    flush_interval=float(os.getenv("METRICS_FLUSH_INTERVAL", "5")),
+)
+
+if not registry.directory and int(os.getenv("GEMINI_WORKERS", os.getenv("WEB_CONCURRENCY", "1"))) > 1:
+    logging.warning("Vários workers sem METRICS_DIR: cada coleta de /metrics verá apenas um worker.")
+
+request_duration = registry.histogram(
+    "http_request_duration_seconds", "Latência total por rota.", ("route", "method", "status")
+)
+stage_duration = registry.histogram(
+    "stage_duration_seconds", "Latência por etapa (prompt, model, parse, feed_fetch, summary_map) e rota.", ("route", "stage")
+)
+model_tokens = registry.counter(
+    "gemini_tokens_total", "Tokens informados em usage_metadata por rota e tipo.", ("route", "kind")
+)
+model_errors = registry.counter("gemini_errors_total", "Erros do modelo por tipo de exceção.", ("error",))
+
+
+def stage(name):
+    return stage_duration.time(route=current_route.get(), stage=name)
+
+
+def record_usage(response):
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return
+    route = current_route.get()
+    for kind, field in (("prompt", "prompt_token_count"), ("completion", "candidates_token_count")):
+        count = getattr(usage, field, 0) or 0
+        if count:
+            model_tokens.inc(count, route=route, kind=kind)
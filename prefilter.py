@@ -0,0 +1,170 @@
+import json
+import logging
+import math
+import os
+import random
+import re
+import threading
+import unicodedata
+import zlib
+
+KEYWORD_BIAS = -4.0
+
+KEYWORD_PATTERNS = [
+    (re.compile(r"\bvagas?\b"), 2.0),
+    (re.compile(r"\bcontrat(ando|amos|a-se)\b|\bhiring\b"), 3.0),
+    (re.compile(r"\b(procuramos|buscamos|precisamos de)\b|\blooking for\b|\bjoin (our|the) team\b"), 1.5),
+    (re.compile(r"\boportunidades?\b|\bopportunity\b|\bposicao\b|\bposition\b"), 1.0),
+    (re.compile(r"\b(pessoa )?desenvolvedor(a|es)?\b|\bengineer\b|\bdeveloper\b|\banalista\b"), 0.8),
+    (re.compile(r"\b(clt|pj)\b"), 1.0),
+    (re.compile(r"\bsalario\b|\bremuneracao\b|\bbeneficios\b"), 1.0),
+    (re.compile(r"\bcandidat(e-se|ar|ura)\b|\bcurriculo\b|\bapply\b|\bjob\b|\bopening\b"), 1.5),
+    (re.compile(r"\b(junior|pleno|senior|estagiari[oa]s?|estagio)\b"), 0.8),
+    (re.compile(r"\b(remoto|hibrido|presencial)\b"), 0.5),
+    (re.compile(r"https?://\S*(gupy|linkedin\.com/jobs|greenhouse|lever\.co|workable|vagas)"), 2.5),
+    (re.compile(r"\bcursos?\b|\btreinamentos?\b|\bbootcamp\b|\bworkshop\b|\bmentoria\b|\baulas?\b|\bwebinar\b"), -2.5),
+]
+
+TOKEN_RE = re.compile(r"\w+")
+
+
+def normalize(text):
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def sigmoid(x):
+    if x >= 0:
+        return 1 / (1 + math.exp(-x))
+    z = math.exp(x)
+    return z / (1 + z)
+
+
+def keyword_score(text):
+    normalized = normalize(text)
+    return KEYWORD_BIAS + sum(weight for pattern, weight in KEYWORD_PATTERNS if pattern.search(normalized))
+
+
+class HashedLinearModel:
+    def __init__(self, buckets=2 ** 18, weights=None, bias=0.0):
+        self.buckets = buckets
+        self.weights = weights or {}
+        self.bias = bias
+
+    def features(self, text):
+        tokens = TOKEN_RE.findall(normalize(text))
+        grams = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        buckets = {zlib.crc32(gram.encode("utf-8")) % self.buckets for gram in grams}
+        scale = 1 / math.sqrt(len(buckets)) if buckets else 0.0
+        return [(bucket, scale) for bucket in buckets]
+
+    def logit(self, features):
+        return self.bias + sum(self.weights.get(bucket, 0.0) * value for bucket, value in features)
+
+    def train(self, samples, epochs=5, learning_rate=0.5, l2=1e-6, seed=0):
+        # Logistic regression on top of the keyword score: the rules are a
+        # fixed offset and the model only learns the residual.
+        rows = [(self.features(text), keyword_score(text), 1.0 if label else 0.0) for text, label in samples]
+        rng = random.Random(seed)
+        for _ in range(epochs):
+            rng.shuffle(rows)
+            for features, offset, target in rows:
+                error = sigmoid(offset + self.logit(features)) - target
+                self.bias -= learning_rate * error
+                for bucket, value in features:
+                    weight = self.weights.get(bucket, 0.0)
+                    self.weights[bucket] = weight - learning_rate * (error * value + l2 * weight)
+        return self
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"buckets": self.buckets, "bias": self.bias, "weights": self.weights}, f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        weights = {int(bucket): weight for bucket, weight in data["weights"].items()}
+        return cls(buckets=data["buckets"], weights=weights, bias=data["bias"])
+
+
+class Prefilter:
+    def __init__(self, model=None, negative_threshold=0.05, positive_threshold=0.98, log_path=None):
+        self.model = model
+        self.negative_threshold = negative_threshold
+        self.positive_threshold = positive_threshold
+        self.log_path = log_path
+        self._lock = threading.Lock()
+
+        self.local_negative = 0
+        self.local_positive = 0
+        self.sent_to_model = 0
+
+    @classmethod
+    def from_env(cls):
+        model = None
+        model_path = os.getenv("PREFILTER_MODEL")
+        if model_path:
+            try:
+                model = HashedLinearModel.load(model_path)
+            except (OSError, ValueError, KeyError) as e:
+                logging.warning(f"Não foi possível carregar o modelo do pré-filtro ({model_path}): {e}")
+        return cls(
+            model=model,
+            negative_threshold=float(os.getenv("PREFILTER_NEGATIVE_THRESHOLD", "0.05")),
+            positive_threshold=float(os.getenv("PREFILTER_POSITIVE_THRESHOLD", "0.98")),
+            log_path=os.getenv("PREFILTER_LOG") or None,
+        )
+
+    def probability(self, text):
+        logit = keyword_score(text)
+        if self.model is not None:
+            logit += self.model.logit(self.model.features(text))
+        return sigmoid(logit)
+
+    def decide(self, text):
+        probability = self.probability(text)
+        with self._lock:
+            # The rules only describe what a job post looks like, so a low
+            # score from them alone means "no rule matched", not "not a job".
+            if probability <= self.negative_threshold and self.model is not None:
+                self.local_negative += 1
+                return False
+            if probability >= self.positive_threshold:
+                self.local_positive += 1
+                return True
+            self.sent_to_model += 1
+        return None
+
+    def record(self, text, verdict):
+        if not self.log_path:
+            return
+        line = json.dumps({"text": text, "label": verdict}, ensure_ascii=False)
+        try:
+            with self._lock, open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        except OSError as e:
+            logging.warning(f"Falha ao registrar veredito do pré-filtro: {e}")
+
+    def stats(self):
+        with self._lock:
+            return {
+                "local_negative": self.local_negative,
+                "local_positive": self.local_positive,
+                "sent_to_model": self.sent_to_model,
+                "model_calls_avoided": self.local_negative + self.local_positive,
+                "linear_model": self.model is not None,
+            }
+
+
+def load_samples(path):
+    samples = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if isinstance(record.get("label"), bool) and record.get("text"):
+                samples.append((record["text"], record["label"]))
+    return samples
@@ -0,0 +1,27 @@
+import json
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def is_stream_requested(args, headers):
+    if args.get("stream", "").lower() in ("1", "true", "yes"):
+        return True
+    return "text/event-stream" in headers.get("Accept", "")
+
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+class KeywordSplitter:
+    def __init__(self):
+        self.buffer = ""
+
+    def feed(self, piece):
+        self.buffer += piece
+        *complete, self.buffer = self.buffer.split(",")
+        return [keyword.strip() for keyword in complete if keyword.strip()]
+
+    def close(self):
+        rest, self.buffer = self.buffer.strip(), ""
+        return [rest] if rest else []
@@ -0,0 +1,292 @@
+import contextvars
+import hashlib
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+from batch import estimate_tokens
+
+
+def feed_hash(post_texts):
+    return hashlib.sha256(" ".join(post_texts).encode("utf-8")).hexdigest()
+
+
+def prepare_post_texts(post_texts):
+    seen = set()
+    prepared = []
+    for text in post_texts:
+        normalized = " ".join(text.split()).casefold()
+        if not normalized or normalized.endswith(": sem texto") or normalized in seen:
+            continue
+        seen.add(normalized)
+        prepared.append(" ".join(text.split()))
+    return prepared
+
+
+def budget_chunks(post_texts, max_tokens, average_posts=None):
+    # Boundaries depend on post content, not position, so new posts at the top
+    # of the feed leave the remaining chunks (and their cached notes) intact.
+    # Without average_posts, chunks are cut by the token budget alone.
+    chunk = []
+    tokens = 0
+    for text in post_texts:
+        cost = estimate_tokens(text)
+        if chunk and tokens + cost > max_tokens:
+            yield chunk
+            chunk = []
+            tokens = 0
+        chunk.append(text)
+        tokens += cost
+        if average_posts and int(hashlib.sha256(text.encode("utf-8")).hexdigest()[:8], 16) % average_posts == 0:
+            yield chunk
+            chunk = []
+            tokens = 0
+    if chunk:
+        yield chunk
+
+
+class SummaryBuild:
+    # One generation in progress. The builder thread appends pieces; any
+    # number of readers follow them without holding the store's lock.
+    def __init__(self, current_hash):
+        self.feed_hash = current_hash
+        self.pieces = []
+        self.done = False
+        self.error = None
+        self._condition = threading.Condition()
+
+    def append(self, piece):
+        with self._condition:
+            self.pieces.append(piece)
+            self._condition.notify_all()
+
+    def finish(self, error=None):
+        with self._condition:
+            self.done = True
+            self.error = error
+            self._condition.notify_all()
+
+    def follow(self):
+        index = 0
+        while True:
+            with self._condition:
+                while index == len(self.pieces) and not self.done:
+                    self._condition.wait()
+                pieces = self.pieces[index:]
+                done, error = self.done, self.error
+            index += len(pieces)
+            yield from pieces
+            if done:
+                if error is not None:
+                    raise error
+                return
+
+    def wait(self):
+        with self._condition:
+            while not self.done:
+                self._condition.wait()
+            if self.error is not None:
+                raise self.error
+            return "".join(self.pieces)
+
+
+class SummaryStore:
+    def __init__(
+        self,
+        load_post_texts,
+        build_summary,
+        stream_summary=None,
+        max_age=300,
+        refresh_interval=300,
+        cache=None,
+        cache_key=None,
+    ):
+        self.load_post_texts = load_post_texts
+        self.build_summary = build_summary
+        self.stream_summary = stream_summary or (lambda post_texts: iter([build_summary(post_texts)]))
+        self.max_age = max_age
+        self.refresh_interval = refresh_interval
+        # A cache shared by all workers (the response cache's disk tier):
+        # a worker adopts a summary another one already built for the feed.
+        self.cache = cache
+        self.cache_key = cache_key or (lambda current_hash: current_hash)
+
+        self._summary = None
+        self._checked_at = 0.0
+        self._build = None
+        self._refresh_lock = threading.Lock()
+        self._check_lock = threading.Lock()
+        self._scheduler = None
+        self._scheduler_lock = threading.Lock()
+
+        self.builds = 0
+        self.shared_hits = 0
+        self.unchanged = 0
+        self.background_refreshes = 0
+        self.refresh_errors = 0
+
+    @classmethod
+    def from_env(cls, load_post_texts, build_summary, stream_summary=None, cache=None, cache_key=None):
+        return cls(
+            load_post_texts,
+            build_summary,
+            stream_summary,
+            max_age=float(os.getenv("SUMMARY_MAX_AGE", "300")),
+            refresh_interval=float(os.getenv("SUMMARY_REFRESH_INTERVAL", "300")),
+            cache=cache,
+            cache_key=cache_key,
+        )
+
+    def get(self, force_refresh=False):
+        self.start_scheduler()
+
+        if force_refresh or self._summary is None:
+            build = self._refresh()
+            if build is not None:
+                build.wait()
+        elif time.monotonic() - self._checked_at > self.max_age:
+            self.refresh_in_background()
+
+        return self.snapshot()
+
+    def stream(self, force_refresh=False):
+        self.start_scheduler()
+
+        build = None
+        if force_refresh or self._summary is None:
+            build = self._refresh()
+        elif time.monotonic() - self._checked_at > self.max_age:
+            self.refresh_in_background()
+
+        if build is not None:
+            for piece in build.follow():
+                yield "summary", {"text": piece}
+            yield "done", self.metadata()
+            return
+
+        snapshot = self.snapshot()
+        yield "summary", {"text": snapshot.pop("summary")}
+        yield "done", snapshot
+
+    def snapshot(self):
+        summary = self._summary
+        if summary is None:
+            return None
+        return {"summary": summary["summary"], **self.metadata()}
+
+    def metadata(self):
+        summary = self._summary
+        return {
+            "feed_hash": summary["feed_hash"],
+            "generated_at": datetime.fromtimestamp(summary["generated_at"], timezone.utc).isoformat(),
+            "age_seconds": round(time.time() - summary["generated_at"], 1),
+        }
+
+    def refresh_in_background(self):
+        if not self._check_lock.acquire(blocking=False):
+            return False
+
+        def run():
+            try:
+                if self._refresh() is not None:
+                    self.background_refreshes += 1
+            except Exception as e:
+                self.refresh_errors += 1
+                logging.error(f"Erro ao atualizar o resumo em segundo plano: {e}")
+            finally:
+                self._check_lock.release()
+
+        threading.Thread(target=run, name="summary-refresh", daemon=True).start()
+        return True
+
+    def _is_current(self, current_hash):
+        if self._summary is None or self._summary["feed_hash"] != current_hash:
+            return False
+        self._checked_at = time.monotonic()
+        self.unchanged += 1
+        return True
+
+    def _refresh(self):
+        # Returns the build in progress (joining one that is already running),
+        # or None when the stored summary still matches the feed.
+        post_texts = self.load_post_texts()
+        current_hash = feed_hash(post_texts)
+
+        with self._refresh_lock:
+            if self._build is not None:
+                return self._build
+            if self._is_current(current_hash) or self._load_shared(current_hash):
+                return None
+            build = self._build = SummaryBuild(current_hash)
+
+        context = contextvars.copy_context()
+        threading.Thread(
+            target=context.run, args=(self._run_build, build, post_texts), name="summary-build", daemon=True
+        ).start()
+        return build
+
+    def _run_build(self, build, post_texts):
+        try:
+            for piece in self.stream_summary(post_texts):
+                build.append(piece)
+            self._store("".join(build.pieces), build.feed_hash)
+            build.finish()
+        except Exception as e:
+            self.refresh_errors += 1
+            logging.error(f"Erro ao gerar o resumo: {e}")
+            build.finish(e)
+        finally:
+            with self._refresh_lock:
+                if self._build is build:
+                    self._build = None
+
+    def _load_shared(self, current_hash):
+        if self.cache is None:
+            return False
+        summary = self.cache.get(self.cache_key(current_hash))
+        if summary is None:
+            return False
+        self._summary = summary
+        self._checked_at = time.monotonic()
+        self.shared_hits += 1
+        logging.info(f"Resumo do feed {current_hash[:12]} reaproveitado do cache compartilhado.")
+        return True
+
+    def _store(self, text, current_hash):
+        self._summary = {"summary": text, "feed_hash": current_hash, "generated_at": time.time()}
+        self._checked_at = time.monotonic()
+        self.builds += 1
+        if self.cache is not None:
+            self.cache.set(self.cache_key(current_hash), self._summary)
+        logging.info(f"Resumo atualizado a partir do feed {current_hash[:12]}.")
+
+    def start_scheduler(self):
+        if self.refresh_interval <= 0 or self._scheduler is not None:
+            return
+
+        with self._scheduler_lock:
+            if self._scheduler is not None:
+                return
+
+            def loop():
+                while True:
+                    time.sleep(self.refresh_interval)
+                    self.refresh_in_background()
+
+            self._scheduler = threading.Thread(target=loop, name="summary-scheduler", daemon=True)
+            self._scheduler.start()
+
+    def stats(self):
+        summary = self._summary
+        return {
+            "builds": self.builds,
+            "shared_hits": self.shared_hits,
+            "unchanged": self.unchanged,
+            "background_refreshes": self.background_refreshes,
+            "refresh_errors": self.refresh_errors,
+            "building": self._build is not None,
+            "feed_hash": summary["feed_hash"] if summary else None,
+            "age_seconds": round(time.time() - summary["generated_at"], 1) if summary else None,
+        }
@@ -0,0 +1,42 @@
+import pytest
+
+from batch import MalformedBatchResponse, chunk_posts, parse_batch_verdicts
+
+
+def test_parses_verdicts_in_id_order():
+    text = '[{"id": 1, "verdict": false}, {"id": 0, "verdict": true}]'
+    assert parse_batch_verdicts(text, 2) == [True, False]
+
+
+def test_accepts_wrapped_verdicts():
+    assert parse_batch_verdicts('{"verdicts": [{"id": "0", "verdict": true}]}', 1) == [True]
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "",
+        "não é JSON",
+        '[{"id": 0, "verdict": true}',
+        '{"id": 0, "verdict": true}',
+        '[{"id": 0, "verdict": "sim"}]',
+        '[{"id": 0}]',
+        '["true"]',
+        None,
+    ],
+)
+def test_malformed_response_raises(text):
+    with pytest.raises(MalformedBatchResponse):
+        parse_batch_verdicts(text, 1)
+
+
+def test_partial_response_raises_with_missing_ids():
+    with pytest.raises(MalformedBatchResponse, match="1, 2"):
+        parse_batch_verdicts('[{"id": 0, "verdict": true}]', 3)
+
+
+def test_chunk_posts_respects_token_and_post_limits():
+    posts = [(i, "x" * 40) for i in range(5)]
+
+    assert [len(chunk) for chunk in chunk_posts(posts, max_tokens=1000, max_posts=2)] == [2, 2, 1]
+    assert [len(chunk) for chunk in chunk_posts(posts, max_tokens=22, max_posts=10)] == [2, 2, 1]
@@ -0,0 +1,208 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from google.api_core import exceptions as google_exceptions
+
+from gemini_client import CircuitOpenError, GeminiClient, ModelUnavailableError, RateLimitedError, TokenBucket
+
+
+class FakeModel:
+    # Each call takes the next outcome from the script: an exception class is
+    # raised, anything else is returned as the response text.
+    def __init__(self, *outcomes, delay=0.0):
+        self.outcomes = list(outcomes)
+        self.delay = delay
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _next(self):
+        with self._lock:
+            self.calls += 1
+            outcome = self.outcomes.pop(0) if len(self.outcomes) > 1 else self.outcomes[0]
+        if isinstance(outcome, type) and issubclass(outcome, Exception):
+            raise outcome("erro de teste")
+        return SimpleNamespace(text=outcome, usage_metadata=None)
+
+    def generate_content(self, contents, stream=False, **kwargs):
+        time.sleep(self.delay)
+        if stream:
+            return self._stream()
+        return self._next()
+
+    def _stream(self):
+        yield self._next()
+        yield self._next()
+
+    async def generate_content_async(self, contents, **kwargs):
+        await asyncio.sleep(self.delay)
+        return self._next()
+
+
+def make_client(model, **kwargs):
+    settings = dict(rate_per_minute=60000, burst=100, max_wait=1, backoff_base=0, backoff_max=0)
+    settings.update(kwargs)
+    return GeminiClient(model, **settings)
+
+
+def test_retries_up_to_max_retries_then_gives_up():
+    model = FakeModel(google_exceptions.ServiceUnavailable)
+    client = make_client(model, max_retries=2, failure_threshold=10)
+
+    with pytest.raises(ModelUnavailableError):
+        client.generate(["prompt"])
+
+    assert model.calls == 3
+    assert client.stats()["retries"] == 2
+    assert client.stats()["failures"] == 1
+
+
+def test_retry_recovers_from_temporary_error():
+    model = FakeModel(google_exceptions.ResourceExhausted, "ok")
+    client = make_client(model, max_retries=2)
+
+    assert client.generate(["prompt"]).text == "ok"
+    assert model.calls == 2
+
+
+def test_non_retryable_error_is_not_retried():
+    model = FakeModel(google_exceptions.InvalidArgument)
+    client = make_client(model, max_retries=3)
+
+    with pytest.raises(google_exceptions.InvalidArgument):
+        client.generate(["prompt"])
+    assert model.calls == 1
+
+
+def test_open_circuit_short_circuits_calls():
+    model = FakeModel(google_exceptions.ServiceUnavailable, "ok")
+    client = make_client(model, max_retries=0, failure_threshold=1, reset_timeout=60)
+
+    with pytest.raises(ModelUnavailableError):
+        client.generate(["prompt"])
+    with pytest.raises(CircuitOpenError):
+        client.generate(["prompt"])
+    assert model.calls == 1
+
+
+def test_rejected_probe_releases_half_open_circuit():
+    model = FakeModel(google_exceptions.ServiceUnavailable, google_exceptions.InvalidArgument, "ok")
+    client = make_client(model, max_retries=0, failure_threshold=1, reset_timeout=0.05)
+
+    with pytest.raises(ModelUnavailableError):
+        client.generate(["prompt"])
+    time.sleep(0.06)
+    with pytest.raises(google_exceptions.InvalidArgument):
+        client.generate(["probe inválido"])
+
+    assert client.generate(["prompt"]).text == "ok"
+    assert client.breaker.state == "closed"
+
+
+def test_failed_probe_reopens_circuit_without_retry():
+    model = FakeModel(google_exceptions.ServiceUnavailable)
+    client = make_client(model, max_retries=3, failure_threshold=1, reset_timeout=0.05)
+
+    with pytest.raises(ModelUnavailableError):
+        client.generate(["prompt"])
+    calls = model.calls
+    time.sleep(0.06)
+    with pytest.raises(ModelUnavailableError):
+        client.generate(["prompt"])
+
+    assert model.calls == calls + 1
+    assert client.breaker.state == "open"
+
+
+def test_rate_limited_probe_is_released():
+    model = FakeModel(google_exceptions.ServiceUnavailable, "ok")
+    client = make_client(model, max_retries=0, failure_threshold=1, reset_timeout=0.05)
+
+    with pytest.raises(ModelUnavailableError):
+        client.generate(["prompt"])
+    time.sleep(0.06)
+    client.bucket.tokens = 0
+    client.bucket.rate = 1 / 60
+    with pytest.raises(RateLimitedError):
+        client.generate(["prompt"])
+
+    assert client.breaker.state == "open"
+    client.bucket.tokens = 1
+    assert client.generate(["prompt"]).text == "ok"
+
+
+def test_stream_retries_only_before_first_chunk():
+    model = FakeModel(google_exceptions.ServiceUnavailable, "a", "b")
+    client = make_client(model, max_retries=2)
+    assert [chunk.text for chunk in client.generate(["prompt"], stream=True)] == ["a", "b"]
+
+    model = FakeModel("a", google_exceptions.ServiceUnavailable)
+    client = make_client(model, max_retries=2)
+    stream = client.generate(["prompt"], stream=True)
+    assert next(stream).text == "a"
+    with pytest.raises(ModelUnavailableError):
+        next(stream)
+    assert model.calls == 2
+
+
+def test_concurrent_identical_requests_are_coalesced():
+    model = FakeModel("ok", delay=0.2)
+    client = make_client(model)
+    results = []
+
+    def call():
+        results.append(client.generate(["mesmo prompt"]).text)
+
+    threads = [threading.Thread(target=call) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == ["ok"] * 5
+    assert model.calls == 1
+    assert client.stats()["coalesced"] == 4
+
+
+def test_concurrent_identical_async_requests_are_coalesced():
+    model = FakeModel("ok", delay=0.05)
+    client = make_client(model)
+
+    async def run():
+        return await asyncio.gather(*(client.generate_async(["mesmo prompt"]) for _ in range(5)))
+
+    assert [response.text for response in asyncio.run(run())] == ["ok"] * 5
+    assert model.calls == 1
+
+
+def test_coalesced_followers_share_the_error():
+    model = FakeModel(google_exceptions.InvalidArgument, delay=0.2)
+    client = make_client(model)
+    errors = []
+
+    def call():
+        try:
+            client.generate(["mesmo prompt"])
+        except google_exceptions.InvalidArgument as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(errors) == 3
+    assert model.calls == 1
+
+
+def test_token_bucket_rejects_waits_over_the_limit():
+    bucket = TokenBucket(rate_per_minute=60, burst=2)
+
+    assert bucket.reserve(max_wait=0) == 0
+    assert bucket.reserve(max_wait=0) == 0
+    with pytest.raises(RateLimitedError):
+        bucket.reserve(max_wait=0.5)
+    assert 0 < bucket.reserve(max_wait=2) <= 1
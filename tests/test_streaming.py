@@ -0,0 +1,29 @@
+from streaming import KeywordSplitter
+
+
+def split(pieces):
+    splitter = KeywordSplitter()
+    keywords = []
+    for piece in pieces:
+        keywords.extend(splitter.feed(piece))
+    return keywords + splitter.close()
+
+
+def test_keyword_split_across_chunks():
+    assert split(["pyth", "on, fla", "sk,", " vaga remo", "ta"]) == ["python", "flask", "vaga remota"]
+
+
+def test_separator_at_chunk_boundary():
+    assert split(["python", ",", "flask", ","]) == ["python", "flask"]
+
+
+def test_empty_keywords_are_dropped():
+    assert split([" , python,,", " ", ""]) == ["python"]
+
+
+def test_feed_only_returns_complete_keywords():
+    splitter = KeywordSplitter()
+    assert splitter.feed("python, fla") == ["python"]
+    assert splitter.feed("sk") == []
+    assert splitter.close() == ["flask"]
+    assert splitter.close() == []
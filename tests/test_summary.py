@@ -0,0 +1,35 @@
+from summary import budget_chunks, feed_hash, prepare_post_texts
+
+
+def posts(count, start=0):
+    return [f"Pessoa {i}: post número {i} sobre vagas e Python." for i in range(start, start + count)]
+
+
+def test_chunks_stay_within_token_budget():
+    for chunk in budget_chunks(posts(200), max_tokens=100, average_posts=8):
+        assert len(chunk) == 1 or sum(len(text) // 4 + 1 for text in chunk) <= 100
+
+
+def test_prepending_posts_keeps_later_chunks():
+    before = list(budget_chunks(posts(200), max_tokens=400, average_posts=8))
+    after = list(budget_chunks(posts(3, start=1000) + posts(200), max_tokens=400, average_posts=8))
+
+    shared = [chunk for chunk in before if chunk in after]
+    assert len(shared) >= len(before) - 2
+    assert before[-5:] == after[-5:]
+
+
+def test_without_average_posts_chunks_are_cut_by_tokens_only():
+    texts = ["mesma anotação"] * 20
+    chunks = list(budget_chunks(texts, max_tokens=20))
+    assert [len(chunk) for chunk in chunks] == [5, 5, 5, 5]
+
+
+def test_prepare_post_texts_drops_duplicates_and_empty_posts():
+    texts = ["Ana: Vaga  Python", "ana: vaga python", "Bia: sem texto", "  ", "Caio: outro"]
+    assert prepare_post_texts(texts) == ["Ana: Vaga Python", "Caio: outro"]
+
+
+def test_feed_hash_changes_with_content():
+    assert feed_hash(["a", "b"]) == feed_hash(["a", "b"])
+    assert feed_hash(["a", "b"]) != feed_hash(["b", "a"])